@@ -0,0 +1,292 @@
+"""
+Offline batch OCR for backfills.
+
+Walks a directory (or reads a manifest of file paths), runs OCR, classification
+and extraction across a process pool and appends one JSON line per document to
+the output file. The output file doubles as the checkpoint: rerunning the same
+command skips every path already recorded in it, so an interrupted run resumes
+where it stopped.
+
+Usage:
+    python batch.py scans/ -o results.jsonl --workers 8
+    python batch.py --manifest paths.txt -o results.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Set
+
+import utils
+from pipeline import process_document, PipelineError
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff')
+
+# Classification config for the current worker process, set by init_worker
+_worker_config: Dict[str, Any] = {}
+
+def iter_directory(root: Path) -> Iterator[str]:
+    """
+    Yield supported files under a directory in a stable order.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+def iter_manifest(manifest: Path) -> Iterator[str]:
+    """
+    Yield file paths from a manifest with one path per line. Blank lines and
+    lines starting with # are ignored; relative paths resolve against the
+    manifest's directory.
+    """
+    base = manifest.parent
+    with open(manifest) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield str(base / line) if not os.path.isabs(line) else line
+
+def load_checkpoint(output_path: Path, retry_failed: bool) -> Set[str]:
+    """
+    Return the paths already recorded in the output file.
+
+    A partially written last line from an interrupted run is truncated away.
+    Failed documents count as done unless retry_failed is set, in which case
+    their error records are removed from the file so each document keeps a
+    single record once it is retried.
+    """
+    done: Set[str] = set()
+    if not output_path.exists():
+        return done
+
+    valid_bytes = 0
+    kept: List[bytes] = []
+    dropped = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record["path"])
+                kept.append(line)
+            else:
+                dropped += 1
+
+    if dropped:
+        logger.info("Retrying %d failed document(s)", dropped)
+        # Rewrite through a temp file so an interruption cannot lose records
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.writelines(kept)
+        os.replace(tmp_path, output_path)
+    elif valid_bytes < output_path.stat().st_size:
+        logger.warning("Truncating incomplete record at end of %s", output_path)
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+def init_worker(config_path: str, warm_up: bool):
+    # Failures are recorded in the output; worker logs would break the progress line
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.NullHandler())
+    _worker_config["config"] = utils.load_classification_config(Path(config_path))
+    if warm_up:
+        utils.initialize_ocr_engine()
+
+def process_path(file_path: str, include_text: bool) -> Dict[str, Any]:
+    """
+    Process one file in a worker process and build its output record.
+    """
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"path": file_path}
+    try:
+        result = process_document(file_path, _worker_config["config"])
+        ocr_text = result.pop("ocr_text")
+        record["status"] = "ok"
+        record.update(result)
+        record["text_length"] = len(ocr_text)
+        if include_text:
+            record["ocr_text"] = ocr_text
+    except PipelineError as e:
+        record["status"] = "error"
+        record["stage"] = e.stage
+        record["error"] = str(e)
+    except Exception as e:
+        record["status"] = "error"
+        record["stage"] = "unknown"
+        record["error"] = str(e)
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class Progress:
+    """
+    Live throughput and ETA on stderr, redrawn at most once per interval.
+    """
+
+    def __init__(self, total: int, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self.last_draw = 0.0
+
+    def update(self, ok: bool):
+        self.done += 1
+        if not ok:
+            self.errors += 1
+        now = time.monotonic()
+        if now - self.last_draw >= self.interval or self.done == self.total:
+            self.last_draw = now
+            self.draw(now)
+
+    def draw(self, now: float):
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.done / elapsed
+        eta = (self.total - self.done) / rate if rate > 0 else 0
+        sys.stderr.write(
+            f"\r{self.done}/{self.total} files | {rate:.2f} files/s | "
+            f"elapsed {format_duration(elapsed)} | ETA {format_duration(eta)} | errors {self.errors}"
+        )
+        sys.stderr.flush()
+
+def run(paths: List[str], output_path: Path, config_path: Path, workers: int,
+        include_text: bool, retry_failed: bool, warm_up: bool) -> int:
+    """
+    Process every path not yet in the output file.
+
+    Returns:
+        Number of documents that failed in this run
+    """
+    done = load_checkpoint(output_path, retry_failed)
+    pending = [p for p in dict.fromkeys(paths) if p not in done]
+    if done:
+        logger.info("Resuming: %d already processed, %d remaining", len(done), len(pending))
+    if not pending:
+        return 0
+
+    progress = Progress(len(pending))
+    # Keep a bounded number of jobs in flight so huge inputs do not queue
+    # tens of thousands of futures up front
+    max_in_flight = workers * 4
+    todo = iter(pending)
+
+    def new_executor() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                   initargs=(str(config_path), warm_up))
+
+    executor = new_executor()
+    in_flight: Dict[Future, str] = {}
+    # Files that were in flight when a worker process died. Each is rerun on
+    # its own, so only the file that actually crashes a worker is failed.
+    suspects: List[str] = []
+    isolating = False
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            while True:
+                if suspects:
+                    if not in_flight:
+                        file_path = suspects.pop(0)
+                        in_flight[executor.submit(process_path, file_path, include_text)] = file_path
+                        isolating = True
+                else:
+                    isolating = False
+                    for file_path in todo:
+                        in_flight[executor.submit(process_path, file_path, include_text)] = file_path
+                        if len(in_flight) >= max_in_flight:
+                            break
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                crashed = []
+                for future in finished:
+                    file_path = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool:
+                        crashed.append(file_path)
+                        continue
+                    out.write(json.dumps(record) + "\n")
+                    progress.update(record["status"] == "ok")
+
+                if crashed:
+                    # Every other job in the broken pool is lost as well
+                    crashed.extend(in_flight.values())
+                    in_flight.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = new_executor()
+                    if isolating:
+                        record = {"path": crashed[0], "status": "error", "stage": "worker",
+                                  "error": "Worker process crashed while processing this file"}
+                        out.write(json.dumps(record) + "\n")
+                        progress.update(False)
+                    else:
+                        logger.debug("Worker crashed, rerunning %d file(s) one at a time", len(crashed))
+                        suspects.extend(crashed)
+                # Flush completed records so they survive an interruption
+                out.flush()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    sys.stderr.write("\n")
+    return progress.errors
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch OCR documents to JSONL with resumable checkpoints.")
+    parser.add_argument("input", nargs="?", help="Directory to walk for PDF and image files")
+    parser.add_argument("--manifest", type=Path, help="File listing one document path per line")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="JSONL output file (also the checkpoint)")
+    parser.add_argument("--config", type=Path, default=Path(__file__).parent / "config.json",
+                        help="Document classification config")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--include-text", action="store_true", help="Include the full OCR text in each record")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocess documents that failed in earlier runs")
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip the OCR warm-up in each worker")
+    args = parser.parse_args(argv)
+
+    if bool(args.input) == bool(args.manifest):
+        parser.error("provide either an input directory or --manifest")
+
+    if args.manifest:
+        paths = list(iter_manifest(args.manifest))
+    else:
+        if not os.path.isdir(args.input):
+            parser.error(f"not a directory: {args.input}")
+        paths = list(iter_directory(Path(args.input)))
+
+    errors = run(
+        paths,
+        output_path=args.output,
+        config_path=args.config,
+        workers=max(1, args.workers),
+        include_text=args.include_text,
+        retry_failed=args.retry_failed,
+        warm_up=not args.no_warm_up
+    )
+    if errors:
+        logger.warning("%d document(s) failed, see records with status=error in %s", errors, args.output)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Serialization benchmark for /upload responses.
+
+Builds a representative response (classification, extracted data and a
+multi-page OCR layout) and times encoding it with the standard library and
+with orjson, the default vs a lean fields= selection, and gzip/brotli
+compression. Prints sizes and per-call timings.
+
+Usage:
+    python benchmark.py --pages 5 --words 400 --repeat 200
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import serialization
+from layout import DocumentLayout, PageLayout
+
+VOCABULARY = ["invoice", "total", "amount", "due", "date", "bill", "to", "payment", "terms",
+              "account", "balance", "statement", "agreement", "party", "2024-01-15", "$1,250.00"]
+
+def build_layout(pages: int, words_per_page: int, seed: int = 0) -> DocumentLayout:
+    """
+    Build a synthetic layout shaped like Tesseract output.
+    """
+    rng = random.Random(seed)
+    page_layouts = []
+    for page_number in range(1, pages + 1):
+        columns: Dict[str, List[float]] = {name: [] for name in ("left", "top", "width", "height",
+                                                                   "conf", "block", "par", "line")}
+        words = []
+        for i in range(words_per_page):
+            words.append(rng.choice(VOCABULARY))
+            columns["left"].append(100 + (i % 12) * 180)
+            columns["top"].append(100 + (i // 12) * 40)
+            columns["width"].append(rng.randint(40, 170))
+            columns["height"].append(rng.randint(24, 32))
+            columns["conf"].append(rng.uniform(60, 97))
+            columns["block"].append(1 + i // 120)
+            columns["par"].append(1 + (i // 36) % 4)
+            columns["line"].append(1 + (i // 12) % 3)
+        page_layouts.append(PageLayout.from_tesseract(
+            {"level": [5] * words_per_page, "text": words,
+             "left": columns["left"], "top": columns["top"], "width": columns["width"],
+             "height": columns["height"], "conf": columns["conf"], "block_num": columns["block"],
+             "par_num": columns["par"], "line_num": columns["line"]},
+            page_number=page_number, size=(2550, 3300)
+        ))
+    return DocumentLayout(page_layouts, paged=pages > 1)
+
+def build_result(layout: DocumentLayout) -> Dict[str, Any]:
+    """
+    A full /upload response with include=ocr_text,layout.
+    """
+    text = layout.text
+    return {
+        "document_type": "Invoice",
+        "keyword_matches": {"Invoice": 5, "Bank Statement": 1, "Contract": 0},
+        "structured_data": {
+            "extracted_data": {
+                "invoice_number": "INV-2024-001",
+                "invoice_date": "2024-01-15",
+                "due_date": "2024-02-15",
+                "total_amount": "$1,250.00",
+                "vendor_name": "ABC Company Ltd.",
+                "line_items": [{"description": f"Item {i}", "amount": f"${i * 25}.00"} for i in range(10)]
+            },
+            "confidence_score": 0.92,
+            "processing_time": "1.2s",
+            "model_used": "gemini-pro"
+        },
+        "processing_info": {
+            "file_name": "invoice.pdf",
+            "file_size": 245760,
+            "content_hash": "9f86d081884c7d659a2feb15d0a08a4c1b4f3e3f0b5b2b7c1b7e6f6f1a2b3c4d",
+            "text_length": len(text),
+            "estimated_cost": {"pages": len(layout.pages), "megapixels_per_page": 8.42, "dpi": 300, "cost": 42.08},
+            "queue_wait_ms": 0
+        },
+        "ocr_text": text,
+        "layout": layout.to_dict()
+    }
+
+def time_call(fn: Callable[[], Any], repeat: int) -> float:
+    """
+    Best per-call time in milliseconds over five rounds of `repeat` calls.
+    """
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+def stdlib_dumps(content: Any) -> bytes:
+    # What FastAPI's default JSONResponse does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /upload response serialization.")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--words", type=int, default=400, help="Words per page")
+    parser.add_argument("--repeat", type=int, default=100, help="Calls per timing round")
+    args = parser.parse_args(argv)
+
+    full = build_result(build_layout(args.pages, args.words))
+    default = {k: v for k, v in full.items() if k not in ("ocr_text", "layout")}
+    lean = serialization.select_fields(default, ["document_type", "structured_data.extracted_data"])
+
+    encoders = [("json", stdlib_dumps)]
+    if serialization.orjson is not None:
+        encoders.append(("orjson", serialization.orjson.dumps))
+    else:
+        print("orjson not installed, skipping (pip install orjson)", file=sys.stderr)
+
+    print(f"{'payload':<28}{'encoder':<10}{'bytes':>10}{'ms/call':>10}")
+    for name, content in (("include=ocr_text,layout", full), ("default", default), ("fields=lean", lean)):
+        for encoder_name, encode in encoders:
+            body = encode(content)
+            ms = time_call(lambda: encode(content), args.repeat)
+            print(f"{name:<28}{encoder_name:<10}{len(body):>10}{ms:>10.3f}")
+
+    body = serialization.dumps(full)
+    encodings = ["gzip"]
+    if serialization.brotli is not None:
+        encodings.append("br")
+    else:
+        print("brotli not installed, skipping (pip install brotli)", file=sys.stderr)
+
+    print(f"\n{'compression':<28}{'':<10}{'bytes':>10}{'ms/call':>10}")
+    for encoding in encodings:
+        size = len(serialization.compress(body, encoding))
+        ms = time_call(lambda: serialization.compress(body, encoding), max(1, args.repeat // 10))
+        print(f"{'include=ocr_text,layout':<28}{encoding:<10}{size:>10}{ms:>10.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import math
+import logging
+import re
+from typing import Dict, Any, List, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A document type maps to either a keyword list (weights derived from how
+# many types share each keyword) or a {keyword: weight} mapping.
+KeywordConfig = Dict[str, Union[List[str], Dict[str, float]]]
+
+def _trie_pattern(terms: List[str]) -> str:
+    """
+    Regex for the longest term starting at a position, built from a character
+    trie so the regex engine walks shared prefixes once instead of trying
+    every term in turn.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A term ends here: the greedy optional group still prefers a longer term
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return emit(trie)
+
+class KeywordClassifier:
+    """
+    Weighted keyword classifier that scores a document against every type at once.
+
+    On construction the config is compiled into a type-by-term weight matrix
+    and a single regex over all terms. Classifying a document counts every
+    term in one pass over the text, then scores all types with a single
+    matrix-vector product, so adding types does not add Python-level work
+    per document.
+
+    Keyword lists get IDF-style weights: a keyword used by many types says
+    little about any one of them. Explicit {keyword: weight} mappings are
+    used as given.
+    """
+
+    def __init__(self, config: KeywordConfig):
+        self.doc_types = list(config.keys())
+
+        # Distinct lowercase terms across all types, in first-seen order
+        term_index: Dict[str, int] = {}
+        self.terms: List[str] = []
+        for keywords in config.values():
+            for keyword in keywords:
+                term = keyword.lower()
+                if term and term not in term_index:
+                    term_index[term] = len(self.terms)
+                    self.terms.append(term)
+
+        n_types, n_terms = len(self.doc_types), len(self.terms)
+        # presence[i, j] is True when type i lists term j
+        self.presence = np.zeros((n_types, n_terms), dtype=bool)
+        explicit = np.zeros((n_types, n_terms), dtype=np.float64)
+        has_explicit = np.zeros(n_types, dtype=bool)
+        # Original keyword spelling per (type, term) for reporting matches
+        self.labels: List[Dict[int, str]] = []
+
+        for i, keywords in enumerate(config.values()):
+            labels = {}
+            has_explicit[i] = isinstance(keywords, dict)
+            for keyword in keywords:
+                j = term_index.get(keyword.lower())
+                if j is None:
+                    continue
+                self.presence[i, j] = True
+                labels[j] = keyword
+                if has_explicit[i]:
+                    explicit[i, j] = float(keywords[keyword])
+            self.labels.append(labels)
+
+        # Smoothed IDF over document types
+        df = self.presence.sum(axis=0)
+        idf = np.log((1.0 + n_types) / (1.0 + df)) + 1.0
+        self.weights = np.where(has_explicit[:, None], explicit, self.presence * idf)
+        self.total_possible = self.presence.sum(axis=1)
+        self._presence_matrix = self.presence.astype(np.float64)
+
+        # Every term matching at a position is a prefix of the longest one, so
+        # a lookahead for the longest term finds all of them in one scan
+        self._pattern = re.compile(f"(?=({_trie_pattern(self.terms)}))") if self.terms else None
+        self._prefix_terms: Dict[str, List[Tuple[int, int]]] = {
+            term: [
+                (term_index[term[:length]], length)
+                for length in range(1, len(term) + 1)
+                if term[:length] in term_index
+            ]
+            for term in self.terms
+        }
+
+    def count_terms(self, text: str) -> np.ndarray:
+        """
+        Count case-insensitive occurrences of every distinct term in the text.
+
+        Counts match str.count: terms may occur inside words, and each term's
+        own occurrences do not overlap, but different terms may overlap.
+        """
+        if self._pattern is None:
+            return np.zeros(0, dtype=np.float64)
+        counts = [0] * len(self.terms)
+        # Where the next occurrence of each term may start
+        next_start = [0] * len(self.terms)
+        for match in self._pattern.finditer(text.lower()):
+            start = match.start()
+            for j, length in self._prefix_terms[match.group(1)]:
+                if start >= next_start[j]:
+                    counts[j] += 1
+                    next_start[j] = start + length
+        return np.array(counts, dtype=np.float64)
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        Classify a document by weighted keyword scores.
+
+        Args:
+            text: Extracted text from OCR
+
+        Returns:
+            Dictionary containing document_type, keyword_counts, detailed_matches
+            (with scores, for the types that matched any keyword) and confidence
+        """
+        if not text or not text.strip() or not self.doc_types:
+            return {
+                "document_type": "Unknown",
+                "keyword_counts": {},
+                "confidence": 0.0
+            }
+
+        counts = self.count_terms(text)
+
+        # Raw keyword counts per type, and weighted scores with sublinear term frequency
+        raw_counts = self._presence_matrix @ counts
+        scores = self.weights @ np.log1p(counts)
+
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            document_type = "Unknown"
+            confidence = 0.0
+        else:
+            document_type = self.doc_types[best]
+            # Softmax over the types that matched anything plus one "Unknown"
+            # logit at zero, so the confidence does not shrink as types are added
+            matched = scores[scores > 0]
+            exp_scores = np.exp(matched - scores[best])
+            confidence = float(1.0 / (exp_scores.sum() + math.exp(-scores[best])))
+
+        # Only the types and terms that matched are visited
+        matched_types = np.flatnonzero(raw_counts)
+        hit_idx = np.flatnonzero(counts)
+        hit_presence = self.presence[np.ix_(matched_types, hit_idx)]
+        detailed_matches = {}
+        for row, i in enumerate(matched_types.tolist()):
+            detailed_matches[self.doc_types[i]] = {
+                "count": int(raw_counts[i]),
+                "score": round(float(scores[i]), 4),
+                "matched_keywords": [self.labels[i][j] for j in hit_idx[hit_presence[row]].tolist()],
+                "total_possible": int(self.total_possible[i])
+            }
+
+        logger.info("Document classified as: %s (confidence: %.2f)", document_type, confidence)
+
+        return {
+            "document_type": document_type,
+            "keyword_counts": dict(zip(self.doc_types, raw_counts.astype(np.int64).tolist())),
+            "detailed_matches": detailed_matches,
+            "confidence": confidence
+        }
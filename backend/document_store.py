@@ -0,0 +1,202 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    document_type TEXT NOT NULL,
+    confidence REAL NOT NULL DEFAULT 0,
+    classification TEXT NOT NULL,
+    structured_data TEXT NOT NULL,
+    ocr_text TEXT NOT NULL,
+    file_name TEXT,
+    file_size INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_type ON documents(document_type, id);
+
+-- External-content FTS index: the text is stored once, in documents.ocr_text
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    ocr_text,
+    content='documents',
+    content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, ocr_text) VALUES (new.id, new.ocr_text);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, ocr_text) VALUES ('delete', old.id, old.ocr_text);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF ocr_text ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, ocr_text) VALUES ('delete', old.id, old.ocr_text);
+    INSERT INTO documents_fts(rowid, ocr_text) VALUES (new.id, new.ocr_text);
+END;
+"""
+
+class DocumentStore:
+    """
+    Persistent SQLite store for OCR results with a full-text index over the OCR text.
+
+    Documents are keyed by content hash so the store also serves as a dedup
+    layer for repeat uploads. One connection is kept per thread.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+        logger.info(f"Document store opened at {self.db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Close the connections opened by every thread. Each connection is still
+        only used by the thread that opened it; close() is for shutdown.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    @staticmethod
+    def _row_to_document(row: sqlite3.Row, include_text: bool = True) -> Dict[str, Any]:
+        document = {
+            "id": row["id"],
+            "content_hash": row["content_hash"],
+            "document_type": row["document_type"],
+            "confidence": row["confidence"],
+            "classification": json.loads(row["classification"]),
+            "structured_data": json.loads(row["structured_data"]),
+            "file_name": row["file_name"],
+            "file_size": row["file_size"],
+            "created_at": row["created_at"]
+        }
+        if include_text:
+            document["ocr_text"] = row["ocr_text"]
+        return document
+
+    def save(
+        self,
+        content_hash: str,
+        document_type: str,
+        classification: Dict[str, Any],
+        structured_data: Dict[str, Any],
+        ocr_text: str,
+        file_name: Optional[str] = None,
+        file_size: Optional[int] = None
+    ) -> int:
+        """
+        Save an OCR result. Saving the same content twice keeps the first copy.
+
+        Returns:
+            Id of the stored document
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO documents (content_hash, document_type, confidence, classification,
+                                       structured_data, ocr_text, file_name, file_size, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(content_hash) DO NOTHING
+                """,
+                (
+                    content_hash,
+                    document_type,
+                    float(classification.get("confidence", 0.0)),
+                    json.dumps(classification),
+                    json.dumps(structured_data),
+                    ocr_text,
+                    file_name,
+                    file_size,
+                    time.time()
+                )
+            )
+        row = conn.execute("SELECT id FROM documents WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row["id"]
+
+    def get(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a stored document by id, or None if it does not exist.
+        """
+        row = self._connection().execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+        return self._row_to_document(row) if row else None
+
+    def get_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a stored document by content hash, or None if it has not been seen.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        return self._row_to_document(row) if row else None
+
+    def search(
+        self,
+        query: str,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text search over stored OCR text, best matches first.
+
+        Args:
+            query: FTS5 query string (words, "phrases", AND/OR/NOT, prefix*)
+            document_type: Optional document type filter
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            List of documents (without full OCR text) with a highlighted snippet
+
+        Raises:
+            ValueError: If the query is not valid FTS5 syntax
+        """
+        sql = """
+            SELECT d.*, snippet(documents_fts, 0, '[', ']', '...', 16) AS snippet
+            FROM documents_fts
+            JOIN documents d ON d.id = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+        """
+        params: List[Any] = [query]
+        if document_type:
+            sql += " AND d.document_type = ?"
+            params.append(document_type)
+        sql += " ORDER BY documents_fts.rank LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        try:
+            rows = self._connection().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {str(e)}")
+
+        results = []
+        for row in rows:
+            document = self._row_to_document(row, include_text=False)
+            document["snippet"] = row["snippet"]
+            results.append(document)
+        return results
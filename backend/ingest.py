@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+ALLOWED_TYPES = ["application/pdf", "image/jpeg", "image/png", "image/jpg"]
+
+# Leading bytes of each accepted format, mapped to its canonical content type
+MAGIC_BYTES = {
+    b"%PDF-": "application/pdf",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+}
+SNIFF_BYTES = max(len(magic) for magic in MAGIC_BYTES)
+
+# Saved files are named by their detected type; OCR picks its code path from the extension
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+}
+
+class IngestError(Exception):
+    """
+    An upload was rejected while streaming. Carries the HTTP status to return.
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+class StreamedUpload:
+    """
+    A file received from a multipart upload and written to disk.
+    """
+
+    def __init__(self, path: Path, filename: Optional[str], content_type: str):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.detected_type: Optional[str] = None
+        self.size = 0
+        self.content_hash: Optional[str] = None
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Identify an accepted format from the first bytes of a file.
+    """
+    for magic, content_type in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return content_type
+    return None
+
+def canonical_type(content_type: str) -> str:
+    return "image/jpeg" if content_type == "image/jpg" else content_type
+
+class _FilePartReceiver:
+    """
+    Multipart parser callbacks that stream one file field to disk, checking
+    the declared type, the magic bytes and the size limit and hashing the
+    content as chunks arrive.
+    """
+
+    def __init__(self, field_name: str, destination_dir: Path, max_bytes: int):
+        self.field_name = field_name
+        self.destination_dir = destination_dir
+        self.max_bytes = max_bytes
+        self.upload: Optional[StreamedUpload] = None
+        self._out = None
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self._in_target = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._in_target = False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") != self.field_name or self.upload is not None:
+            return
+
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+        if content_type not in ALLOWED_TYPES:
+            raise IngestError(400, f"Unsupported file type: {content_type}. Allowed types: PDF, JPEG, PNG")
+
+        filename = options.get(b"filename", b"").decode("utf-8", "replace") or None
+        # Renamed to the detected type's extension once the part is complete
+        path = self.destination_dir / f"{uuid.uuid4()}.part"
+        self.upload = StreamedUpload(path, filename, content_type)
+        self._out = open(path, "wb")
+        self._in_target = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_target:
+            return
+        chunk = data[start:end]
+        upload = self.upload
+        upload.size += len(chunk)
+        if upload.size > self.max_bytes:
+            raise IngestError(400, "File size too large. Maximum allowed size is 10MB.")
+
+        # Check the magic bytes as soon as enough of the file has arrived
+        if upload.detected_type is None:
+            self._head += chunk[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_magic()
+
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def on_part_end(self):
+        if not self._in_target:
+            return
+        self._in_target = False
+        if self.upload.detected_type is None and self.upload.size:
+            # File shorter than the longest signature
+            self._check_magic()
+        self._out.close()
+        self.upload.content_hash = self._digest.hexdigest()
+        if self.upload.detected_type is not None:
+            self.upload.path = self.upload.path.rename(
+                self.upload.path.with_suffix(EXTENSIONS[self.upload.detected_type])
+            )
+
+    def _check_magic(self):
+        detected = sniff_content_type(self._head)
+        if detected is None or detected != canonical_type(self.upload.content_type):
+            raise IngestError(
+                400,
+                f"File content does not match declared type {self.upload.content_type}"
+                + (f" (looks like {detected})" if detected else "")
+            )
+        self.upload.detected_type = detected
+
+    def discard(self):
+        if self._out is not None:
+            self._out.close()
+        if self.upload is not None and self.upload.path.exists():
+            self.upload.path.unlink()
+
+async def receive_upload(request: Request, destination_dir: Path, field_name: str = "file",
+                         max_bytes: int = MAX_UPLOAD_BYTES) -> StreamedUpload:
+    """
+    Stream a multipart upload to disk chunk by chunk.
+
+    The size limit, declared content type and magic bytes are enforced as
+    data arrives, so oversized or mislabeled uploads are rejected without
+    reading the rest of the body. The SHA-256 of the content is computed in
+    the same pass. The file is saved with the extension of its detected type,
+    whatever the client called it.
+
+    Args:
+        request: Incoming request with a multipart/form-data body
+        destination_dir: Directory to write the file to
+        field_name: Name of the form field holding the file
+        max_bytes: Maximum file size
+
+    Returns:
+        StreamedUpload describing the saved file
+
+    Raises:
+        IngestError: If the upload is rejected
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise IngestError(400, "File size too large. Maximum allowed size is 10MB.")
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise IngestError(400, "Expected a multipart/form-data upload")
+
+    receiver = _FilePartReceiver(field_name, destination_dir, max_bytes)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                parser.write(chunk)
+        parser.finalize()
+    except IngestError:
+        receiver.discard()
+        raise
+    except Exception as e:
+        receiver.discard()
+        raise IngestError(400, f"Malformed upload: {str(e)}")
+
+    upload = receiver.upload
+    if upload is None:
+        raise IngestError(400, f"No file provided in form field '{field_name}'")
+    if upload.content_hash is None:
+        receiver.discard()
+        raise IngestError(400, "Upload ended before the file was complete")
+    if upload.size == 0:
+        receiver.discard()
+        raise IngestError(400, "Uploaded file is empty")
+    return upload
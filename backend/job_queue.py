@@ -0,0 +1,291 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_available ON jobs(state, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(state, lease_expires_at);
+
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    warm INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL
+);
+"""
+
+class Job:
+    """
+    A leased job handed to a worker.
+    """
+
+    __slots__ = ("id", "payload", "attempts", "max_attempts", "lease_owner")
+
+    def __init__(self, id: int, payload: Dict[str, Any], attempts: int, max_attempts: int, lease_owner: str):
+        self.id = id
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.lease_owner = lease_owner
+
+class JobQueue:
+    """
+    Durable SQLite-backed job queue with leases, retries and dead-lettering.
+
+    Any number of processes on the same host can share one database file.
+    A leased job that is not completed, failed or heartbeated before its lease
+    expires is handed to another worker; after max_attempts it is dead-lettered.
+    """
+
+    def __init__(self, db_path: str, retry_backoff: float = 1.0):
+        self.db_path = str(db_path)
+        self.retry_backoff = retry_backoff
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Close the connections opened by every thread. Each connection is still
+        only used by the thread that opened it; close() is for shutdown.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def enqueue(self, payload: Dict[str, Any], max_attempts: int = 3) -> int:
+        """
+        Add a job to the queue.
+
+        Returns:
+            Id of the new job
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            """
+            INSERT INTO jobs (payload, state, max_attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (json.dumps(payload), QUEUED, max_attempts, now, now, now)
+        )
+        return cursor.lastrowid
+
+    def lease(self, worker_id: str, lease_seconds: float = 60.0) -> Optional[Job]:
+        """
+        Claim the oldest available job, including jobs whose lease has expired.
+
+        Returns:
+            The leased job, or None if the queue is empty
+        """
+        conn = self._connection()
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    """
+                    SELECT id, payload, state, attempts, max_attempts FROM jobs
+                    WHERE (state = ? AND available_at <= ?) OR (state = ? AND lease_expires_at < ?)
+                    ORDER BY id LIMIT 1
+                    """,
+                    (QUEUED, now, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                # A worker died holding this job and it has no attempts left
+                if row["state"] == LEASED and row["attempts"] >= row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                        (DEAD, "Lease expired on final attempt", now, row["id"])
+                    )
+                    conn.execute("COMMIT")
+                    logger.warning("Job %d dead-lettered after its final lease expired", row["id"])
+                    continue
+
+                conn.execute(
+                    """
+                    UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?,
+                                    lease_expires_at = ?, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (LEASED, worker_id, now + lease_seconds, now, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return Job(row["id"], json.loads(row["payload"]), row["attempts"] + 1, row["max_attempts"], worker_id)
+
+    def heartbeat(self, job: Job, lease_seconds: float = 60.0) -> bool:
+        """
+        Extend a job's lease. Returns False if the lease was lost to another worker.
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+            (now + lease_seconds, now, job.id, LEASED, job.lease_owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, result: Dict[str, Any]) -> bool:
+        """
+        Mark a leased job as done. Returns False if the lease was lost.
+        """
+        cursor = self._connection().execute(
+            """
+            UPDATE jobs SET state = ?, result = ?, error = NULL, lease_owner = NULL, updated_at = ?
+            WHERE id = ? AND state = ? AND lease_owner = ?
+            """,
+            (DONE, json.dumps(result), time.time(), job.id, LEASED, job.lease_owner)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, error: str, retry: bool = True) -> str:
+        """
+        Record a failed attempt. The job is requeued with exponential backoff
+        while attempts remain, otherwise dead-lettered.
+
+        Returns:
+            The job's new state
+        """
+        now = time.time()
+        if retry and job.attempts < job.max_attempts:
+            state = QUEUED
+            available_at = now + self.retry_backoff * (2 ** (job.attempts - 1))
+        else:
+            state = DEAD
+            available_at = now
+        self._connection().execute(
+            """
+            UPDATE jobs SET state = ?, error = ?, available_at = ?, lease_owner = NULL, updated_at = ?
+            WHERE id = ? AND state = ? AND lease_owner = ?
+            """,
+            (state, error, available_at, now, job.id, LEASED, job.lease_owner)
+        )
+        if state == DEAD:
+            logger.warning("Job %d dead-lettered after %d attempt(s): %s", job.id, job.attempts, error)
+        return state
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Return a job's state, attempts, result and error, or None if unknown.
+        """
+        row = self._connection().execute(
+            "SELECT id, state, attempts, max_attempts, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def delete(self, job_id: int):
+        """
+        Remove a finished job once its result has been consumed.
+        """
+        self._connection().execute("DELETE FROM jobs WHERE id = ? AND state IN (?, ?)", (job_id, DONE, DEAD))
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Return dead-lettered jobs, newest first.
+        """
+        rows = self._connection().execute(
+            "SELECT id, payload, attempts, error, updated_at FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?",
+            (DEAD, limit)
+        ).fetchall()
+        return [dict(row, payload=json.loads(row["payload"])) for row in rows]
+
+    def cancel(self, job_id: int, reason: str) -> bool:
+        """
+        Dead-letter a job that is still queued or leased because nobody is
+        waiting for its result any more. A worker holding the lease loses it
+        and discards its result.
+        """
+        cursor = self._connection().execute(
+            """
+            UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, updated_at = ?
+            WHERE id = ? AND state IN (?, ?)
+            """,
+            (DEAD, reason, time.time(), job_id, QUEUED, LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Count jobs per state.
+        """
+        rows = self._connection().execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, DEAD: 0}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def register_worker(self, worker_id: str, warm: bool):
+        """
+        Record that a worker is alive, and whether its OCR engine is warm.
+        """
+        self._connection().execute(
+            """
+            INSERT INTO workers (worker_id, warm, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT(worker_id) DO UPDATE SET warm = excluded.warm, last_seen = excluded.last_seen
+            """,
+            (worker_id, int(warm), time.time())
+        )
+
+    def unregister_worker(self, worker_id: str):
+        self._connection().execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self, max_age: float = 30.0) -> Dict[str, int]:
+        """
+        Count workers seen within max_age seconds, and how many of them are warm.
+        """
+        row = self._connection().execute(
+            "SELECT COUNT(*) AS total, COALESCE(SUM(warm), 0) AS warm FROM workers WHERE last_seen >= ?",
+            (time.time() - max_age,)
+        ).fetchone()
+        return {"total": row["total"], "warm": row["warm"]}
@@ -0,0 +1,168 @@
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Columns stored per word, with their array types
+WORD_COLUMNS = {
+    "left": np.int32,
+    "top": np.int32,
+    "width": np.int32,
+    "height": np.int32,
+    "conf": np.float32,
+    "block": np.int32,
+    "par": np.int32,
+    "line": np.int32,
+}
+
+# Tesseract's image_to_data level for individual words
+WORD_LEVEL = 5
+
+class PageLayout:
+    """
+    Words recognised on one page, with bounding boxes, confidences and
+    block/paragraph/line ids, from a single Tesseract pass.
+
+    Storage is columnar: one NumPy array per attribute, and all word strings
+    packed into a single space-separated string with start offsets. The plain
+    text is rebuilt from the layout only when first asked for.
+    """
+
+    __slots__ = ("page_number", "size", "rotation", "columns", "_words", "_starts", "_text")
+
+    def __init__(self, page_number: int, size: Tuple[int, int], rotation: Optional[int],
+                 words: List[str], columns: Dict[str, np.ndarray]):
+        self.page_number = page_number
+        self.size = size
+        self.rotation = rotation
+        self.columns = {
+            name: columns[name] if name in columns else np.empty(0, dtype=dtype)
+            for name, dtype in WORD_COLUMNS.items()
+        }
+        # Words never contain whitespace, so a single space separates them unambiguously
+        self._words = " ".join(words)
+        lengths = np.fromiter((len(w) + 1 for w in words), dtype=np.int64, count=len(words))
+        self._starts = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self._text: Optional[str] = None
+
+    @classmethod
+    def from_tesseract(cls, data: Dict[str, list], page_number: int = 1,
+                       size: Tuple[int, int] = (0, 0), rotation: Optional[int] = None) -> "PageLayout":
+        """
+        Build a layout from pytesseract.image_to_data(..., output_type=Output.DICT).
+        """
+        keep = [
+            i for i, (level, text) in enumerate(zip(data["level"], data["text"]))
+            if int(level) == WORD_LEVEL and text and text.strip()
+        ]
+        source = {"left": "left", "top": "top", "width": "width", "height": "height", "conf": "conf",
+                  "block": "block_num", "par": "par_num", "line": "line_num"}
+        columns = {
+            name: np.array([float(data[source[name]][i]) for i in keep], dtype=dtype)
+            for name, dtype in WORD_COLUMNS.items()
+        }
+        words = [data["text"][i].strip() for i in keep]
+        return cls(page_number, size, rotation, words, columns)
+
+    @classmethod
+    def from_dict(cls, page: Dict[str, Any]) -> "PageLayout":
+        """
+        Rebuild a layout from to_dict() output.
+        """
+        columns = {name: np.asarray(page[name], dtype=dtype) for name, dtype in WORD_COLUMNS.items()}
+        return cls(page["page"], tuple(page["size"]), page.get("rotation"), page["words"], columns)
+
+    def __len__(self) -> int:
+        return len(self._starts) - 1
+
+    def word(self, index: int) -> str:
+        return self._words[self._starts[index]:self._starts[index + 1] - 1]
+
+    @property
+    def words(self) -> List[str]:
+        return self._words.split(" ") if len(self) else []
+
+    @property
+    def mean_confidence(self) -> float:
+        conf = self.columns["conf"]
+        return float(conf.mean()) if len(conf) else 0.0
+
+    def lines(self) -> Iterator[Tuple[Tuple[int, int, int], str]]:
+        """
+        Yield ((block, par, line), text) for each line in reading order.
+        """
+        if not len(self):
+            return
+        ids = np.stack([self.columns["block"], self.columns["par"], self.columns["line"]], axis=1)
+        # Indices where a new line starts
+        breaks = np.flatnonzero(np.any(ids[1:] != ids[:-1], axis=1)) + 1
+        bounds = np.concatenate(([0], breaks, [len(self)]))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            text = self._words[self._starts[start]:self._starts[end] - 1]
+            yield tuple(int(v) for v in ids[start]), text
+
+    @property
+    def text(self) -> str:
+        """
+        Plain text derived from the layout: words joined by spaces, lines by
+        newlines and paragraphs/blocks by a blank line. Built on first access.
+        """
+        if self._text is None:
+            parts = []
+            previous = None
+            for (block, par, _), line in self.lines():
+                if previous is not None and previous != (block, par):
+                    parts.append("")
+                parts.append(line)
+                previous = (block, par)
+            self._text = "\n".join(parts)
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Compact columnar representation for JSON responses and job results.
+        """
+        page = {
+            "page": self.page_number,
+            "size": list(self.size),
+            "rotation": self.rotation,
+            "words": self.words,
+        }
+        for name, values in self.columns.items():
+            page[name] = [round(float(c), 2) for c in values] if name == "conf" else values.tolist()
+        return page
+
+class DocumentLayout:
+    """
+    Layouts for every page OCR'd from one file.
+
+    For paged sources (PDFs) the derived text keeps the "--- Page N ---"
+    separators that process_ocr has always produced.
+    """
+
+    __slots__ = ("pages", "paged", "_text")
+
+    def __init__(self, pages: List[PageLayout], paged: bool = False):
+        self.pages = pages
+        self.paged = paged
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """
+        Plain text of all pages. Built on first access.
+        """
+        if self._text is None:
+            if not self.paged:
+                self._text = "\n".join(page.text for page in self.pages).strip()
+            else:
+                self._text = "".join(
+                    f"\n--- Page {page.page_number} ---\n{page.text}" for page in self.pages if page.text
+                ).strip()
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"paged": self.paged, "pages": [page.to_dict() for page in self.pages]}
+
+    @classmethod
+    def from_dict(cls, layout: Dict[str, Any]) -> "DocumentLayout":
+        return cls([PageLayout.from_dict(page) for page in layout["pages"]], layout.get("paged", False))
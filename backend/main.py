@@ -1,12 +1,23 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import logging
 import os
-import shutil
-import uuid
-import json
 from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
 import utils
 import mock_gemini as gemini_client
+import tracing
+from document_store import DocumentStore
+import ingest
+from pipeline import extraction_fallback
+from job_queue import JobQueue
+from ocr_backends import LocalOCRBackend, QueueOCRBackend
+import scheduler
+import serialization
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="OCR Document Processor", version="1.0.0")
 
@@ -25,16 +36,80 @@ TEMP_DIR.mkdir(exist_ok=True)
 
 # Load document classification config
 CONFIG_PATH = Path("./config.json")
-try:
-    with open(CONFIG_PATH) as f:
-        CLASSIFICATION_CONFIG = json.load(f)
-except FileNotFoundError:
-    # Default configuration if file doesn't exist
-    CLASSIFICATION_CONFIG = {
-        "Invoice": ["Invoice Number", "Total", "Date", "Due", "Bill", "Amount"],
-        "Bank Statement": ["Account Number", "Transaction", "Balance", "Statement", "Bank", "Deposit"],
-        "Contract": ["Parties", "Agreement", "Effective Date", "Terms", "Contract", "Party"]
-    }
+CLASSIFICATION_CONFIG = utils.load_classification_config(CONFIG_PATH)
+
+# Optional persistent document store, enabled by setting DOCUMENT_STORE_PATH
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH")
+
+# OCR backend: a thread pool in this process, or separate worker
+# processes (worker.py) fed through a durable job queue when OCR_QUEUE_PATH is set
+OCR_QUEUE_PATH = os.getenv("OCR_QUEUE_PATH")
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", os.cpu_count() or 1)))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "300"))
+OCR_JOB_MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+
+# Opened in startup() and closed in shutdown(), so importing this module
+# touches no files and every app run gets its own OCR pool
+DOCUMENT_STORE: Optional[DocumentStore] = None
+OCR_QUEUE: Optional[JobQueue] = None
+OCR_BACKEND: Optional[Union[LocalOCRBackend, QueueOCRBackend]] = None
+
+# Cost-aware admission control in front of OCR, fair across clients. Cost is in
+# megapixels run through OCR.
+SCHEDULER = scheduler.FairScheduler(
+    budget=float(os.getenv("OCR_COMPUTE_BUDGET_MP", "100")),
+    max_wait=float(os.getenv("OCR_MAX_QUEUE_WAIT", "30")),
+    max_queued_per_client=int(os.getenv("OCR_MAX_QUEUED_PER_CLIENT", "10")),
+    max_queued_cost=float(os.getenv("OCR_MAX_QUEUED_COST_MP", "1000"))
+)
+# Clients are identified by address unless a trusted proxy sets X-Client-Id;
+# a client-controlled header would let callers pick a fresh quota per request
+TRUST_CLIENT_ID_HEADER = os.getenv("OCR_TRUST_CLIENT_ID", "").lower() in ("1", "true", "yes")
+
+def client_identity(request: Request) -> str:
+    if TRUST_CLIENT_ID_HEADER and request.headers.get("X-Client-Id"):
+        return request.headers["X-Client-Id"]
+    return request.client.host if request.client else "anonymous"
+
+@app.on_event("startup")
+async def startup():
+    global DOCUMENT_STORE, OCR_QUEUE, OCR_BACKEND
+    if DOCUMENT_STORE_PATH:
+        DOCUMENT_STORE = DocumentStore(DOCUMENT_STORE_PATH)
+    if OCR_QUEUE_PATH:
+        OCR_QUEUE = JobQueue(OCR_QUEUE_PATH)
+        OCR_BACKEND = QueueOCRBackend(OCR_QUEUE, timeout=OCR_JOB_TIMEOUT, max_attempts=OCR_JOB_MAX_ATTEMPTS)
+    else:
+        OCR_BACKEND = LocalOCRBackend(OCR_WORKERS)
+    # Run the warm-up in the background so /health answers immediately
+    app.state.warmup_task = asyncio.create_task(OCR_BACKEND.start())
+
+@app.on_event("shutdown")
+async def shutdown():
+    global DOCUMENT_STORE, OCR_QUEUE, OCR_BACKEND
+    app.state.warmup_task.cancel()
+    OCR_BACKEND.shutdown()
+    if OCR_QUEUE is not None:
+        OCR_QUEUE.close()
+    if DOCUMENT_STORE is not None:
+        DOCUMENT_STORE.close()
+    DOCUMENT_STORE = OCR_QUEUE = OCR_BACKEND = None
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Open a trace per request when tracing is enabled and report stage timings.
+    """
+    trace = tracing.start_trace(f"{request.method} {request.url.path}")
+    if trace is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        tracing.end_trace(trace)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    response.headers["Server-Timing"] = trace.server_timing()
+    return response
 
 @app.get("/")
 async def root():
@@ -44,45 +119,133 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "OCR Document Processor"}
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.get("/ready")
+async def readiness_check():
+    """
+    Report readiness once the OCR engine has been validated and warmed up,
+    or, with the job queue, once a warm worker has checked in.
+    """
+    status = dict(await OCR_BACKEND.readiness(), scheduler=SCHEDULER.stats())
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# /upload reads its multipart body itself (see ingest.py), so describe it for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+# Optional extras for /upload, left out of the default response
+UPLOAD_INCLUDES = {"ocr_text", "layout"}
+
+async def render_upload_result(request: Request, result: Dict[str, Any], fields: List[str],
+                               extras: Dict[str, Any], headers: Dict[str, str]) -> Response:
+    content = serialization.select_fields(result, fields)
+    content.update(extras)
+    # OCR text and layouts can be large, encode them off the event loop
+    return await serialization.json_response(request, content, headers=headers, offload=bool(extras))
+
+@app.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_file(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return; dotted paths select nested keys"),
+    include: Optional[str] = Query(None, description="Comma-separated extras: ocr_text, layout")
+):
     """
     Upload and process a document file (PDF or image) for OCR and structured data extraction.
     
+    The file is streamed to disk in chunks; the 10MB limit, declared type and
+    magic bytes are checked as data arrives and the content hash is computed
+    in the same pass.
+    
+    Use fields= to return only some fields (e.g. fields=document_type,structured_data.extracted_data)
+    and include= to add the full OCR text (ocr_text) or the OCR page layout (layout).
+    Responses are gzip/brotli compressed when the client accepts it.
+    
     Returns:
     - document_type: Classified document type based on keyword matching
     - keyword_matches: Count of keywords found for each document type
     - structured_data: AI-extracted structured information based on document type
     """
     
-    # Validate file type
-    allowed_types = ["application/pdf", "image/jpeg", "image/png", "image/jpg"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file type: {file.content_type}. Allowed types: PDF, JPEG, PNG"
-        )
-    
-    # Validate file size (10MB limit)
-    if file.size and file.size > 10 * 1024 * 1024:
+    selected_fields = serialization.parse_list(fields)
+    includes = set(serialization.parse_list(include))
+    if includes - UPLOAD_INCLUDES:
         raise HTTPException(
             status_code=400,
-            detail="File size too large. Maximum allowed size is 10MB."
+            detail=f"Unknown include: {', '.join(sorted(includes - UPLOAD_INCLUDES))}. Allowed: {', '.join(sorted(UPLOAD_INCLUDES))}"
         )
+    extras: Dict[str, Any] = {}
+    headers: Dict[str, str] = {}
     
-    # Generate unique filename and save temporarily
-    file_extension = Path(file.filename or "document").suffix
-    filename = f"{uuid.uuid4()}{file_extension}"
-    file_location = TEMP_DIR / filename
+    # Stream the upload to a temp file, rejecting it as soon as it is invalid
+    try:
+        with tracing.span("save"):
+            file = await ingest.receive_upload(request, TEMP_DIR)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    file_location = file.path
+    content_hash = file.content_hash
     
     try:
-        # Save uploaded file
-        with open(file_location, "wb") as f_out:
-            shutil.copyfileobj(file.file, f_out)
+        # Return the stored result for content we have already processed
+        if DOCUMENT_STORE is not None:
+            with tracing.span("dedup"):
+                stored = await asyncio.get_running_loop().run_in_executor(
+                    None, DOCUMENT_STORE.get_by_hash, content_hash
+                )
+            if stored is not None:
+                # The layout is not stored, so include=layout is ignored for cached results
+                if "ocr_text" in includes:
+                    extras["ocr_text"] = stored["ocr_text"]
+                result = {
+                    "document_type": stored["document_type"],
+                    "keyword_matches": stored["classification"].get("keyword_counts", {}),
+                    "structured_data": stored["structured_data"],
+                    "processing_info": {
+                        "file_name": file.filename,
+                        "file_size": file.size,
+                        "content_hash": content_hash,
+                        "text_length": len(stored["ocr_text"]),
+                        "document_id": stored["id"],
+                        "cached": True
+                    }
+                }
+                return await render_upload_result(request, result, selected_fields, extras, headers)
+        
+        # Estimate the OCR cost and wait for a fair share of the compute budget
+        loop = asyncio.get_running_loop()
+        with tracing.span("admission") as admission:
+            cost = await loop.run_in_executor(
+                None, scheduler.estimate_cost, str(file_location), file.detected_type
+            )
+            client_id = client_identity(request)
+            try:
+                ticket = await SCHEDULER.acquire(client_id, cost["cost"])
+            except scheduler.AdmissionError as e:
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail=str(e),
+                    headers={"Retry-After": str(e.retry_after), "X-Estimated-Cost": str(cost["cost"])}
+                )
+            admission.set(cost=cost["cost"], queue_wait_ms=ticket.queue_wait_ms)
+        headers["X-Estimated-Cost"] = str(cost["cost"])
+        headers["X-Queue-Wait-Ms"] = str(ticket.queue_wait_ms)
         
         # Process OCR to extract text
         try:
-            ocr_text = utils.process_ocr(str(file_location))
+            with tracing.span("ocr"):
+                layout = await OCR_BACKEND.run_ocr(str(file_location))
+            ocr_text = layout.text
             if not ocr_text.strip():
                 raise HTTPException(
                     status_code=422,
@@ -93,10 +256,13 @@ async def upload_file(file: UploadFile = File(...)):
                 status_code=422,
                 detail=f"OCR processing failed: {str(e)}"
             )
+        finally:
+            SCHEDULER.release(ticket)
         
         # Classify document based on keywords
         try:
-            classification = utils.classify_document(ocr_text, CLASSIFICATION_CONFIG)
+            with tracing.span("classify"):
+                classification = utils.classify_document(ocr_text, CLASSIFICATION_CONFIG)
             doc_type = classification.get("document_type", "Unknown")
             keyword_counts = classification.get("keyword_counts", {})
         except Exception as e:
@@ -106,14 +272,14 @@ async def upload_file(file: UploadFile = File(...)):
             )
         
         # Extract structured data using Mock Gemini API
+        extraction_failed = False
         try:
-            structured_data = await gemini_client.extract_structured_data(doc_type, ocr_text)
+            with tracing.span("extract"):
+                structured_data = await gemini_client.extract_structured_data(doc_type, ocr_text)
         except Exception as e:
             # If Mock API fails, return basic extraction with error note
-            structured_data = {
-                "error": f"AI extraction failed: {str(e)}",
-                "raw_text_preview": ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
-            }
+            structured_data = extraction_fallback(ocr_text, e)
+            extraction_failed = True
         
         # Prepare response
         result = {
@@ -123,11 +289,44 @@ async def upload_file(file: UploadFile = File(...)):
             "processing_info": {
                 "file_name": file.filename,
                 "file_size": file.size,
-                "text_length": len(ocr_text)
+                "content_hash": content_hash,
+                "text_length": len(ocr_text),
+                "estimated_cost": cost,
+                "queue_wait_ms": ticket.queue_wait_ms
             }
         }
+        if "ocr_text" in includes:
+            extras["ocr_text"] = ocr_text
+        if "layout" in includes:
+            extras["layout"] = layout.to_dict()
+        
+        # Persist the result so it can be searched and deduplicated later. A failed
+        # extraction is not stored, otherwise every repeat upload would get the error
+        if DOCUMENT_STORE is not None and not extraction_failed:
+            try:
+                with tracing.span("store"):
+                    result["processing_info"]["document_id"] = await loop.run_in_executor(
+                        None,
+                        lambda: DOCUMENT_STORE.save(
+                            content_hash=content_hash,
+                            document_type=doc_type,
+                            classification={
+                                "keyword_counts": keyword_counts,
+                                "detailed_matches": classification.get("detailed_matches", {}),
+                                "confidence": classification.get("confidence", 0.0)
+                            },
+                            structured_data=structured_data,
+                            ocr_text=ocr_text,
+                            file_name=file.filename,
+                            file_size=file.size
+                        )
+                    )
+                result["processing_info"]["cached"] = False
+            except Exception as e:
+                # Storage is best effort, the OCR result is still returned
+                logger.error(f"Failed to store document: {str(e)}")
         
-        return result
+        return await render_upload_result(request, result, selected_fields, extras, headers)
         
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -146,6 +345,93 @@ async def upload_file(file: UploadFile = File(...)):
             except Exception:
                 pass  # Ignore cleanup errors
 
+def require_document_store() -> DocumentStore:
+    if DOCUMENT_STORE is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Document store is not enabled. Set DOCUMENT_STORE_PATH to enable it."
+        )
+    return DOCUMENT_STORE
+
+@app.get("/documents/search")
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    document_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Full-text search over the OCR text of stored documents.
+    """
+    store = require_document_store()
+    loop = asyncio.get_running_loop()
+    try:
+        results = await loop.run_in_executor(
+            None, lambda: store.search(q, document_type=document_type, limit=limit, offset=offset)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "count": len(results), "results": results}
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: int):
+    """
+    Return a stored document, including its full OCR text.
+    """
+    store = require_document_store()
+    document = await asyncio.get_running_loop().run_in_executor(None, store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    return document
+
+@app.get("/debug/profiles")
+async def list_profiles():
+    """
+    List the sampled cProfile captures kept for slow requests, newest first.
+    """
+    if not tracing.TRACING_ENABLED:
+        raise HTTPException(status_code=404, detail="Tracing is not enabled. Set TRACING_ENABLED=1 to enable it.")
+    return {
+        "sample_rate": tracing.PROFILE_SAMPLE_RATE,
+        "threshold_ms": tracing.PROFILE_THRESHOLD_MS,
+        "profiles": tracing.list_profiles()
+    }
+
+@app.get("/debug/profiles/{trace_id}")
+async def download_profile(trace_id: str):
+    """
+    Download a captured profile in pstats format (load with pstats.Stats or snakeviz).
+    """
+    if not tracing.TRACING_ENABLED:
+        raise HTTPException(status_code=404, detail="Tracing is not enabled. Set TRACING_ENABLED=1 to enable it.")
+    data = tracing.get_profile(trace_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {trace_id}")
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{trace_id}.prof"'}
+    )
+
+def require_job_queue() -> JobQueue:
+    if OCR_QUEUE is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job queue is not enabled. Set OCR_QUEUE_PATH to enable it."
+        )
+    return OCR_QUEUE
+
+@app.get("/queue/dead-letters")
+async def list_dead_letters(limit: int = Query(100, ge=1, le=1000)):
+    """
+    List OCR jobs that failed on every attempt, newest first.
+    """
+    queue = require_job_queue()
+    loop = asyncio.get_running_loop()
+    stats = await loop.run_in_executor(None, queue.stats)
+    dead_letters = await loop.run_in_executor(None, queue.dead_letters, limit)
+    return {"stats": stats, "dead_letters": dead_letters}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001, reload=True)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+import utils
+import tracing
+from job_queue import JobQueue, DONE, DEAD
+from layout import DocumentLayout
+
+logger = logging.getLogger(__name__)
+
+class LocalOCRBackend:
+    """
+    Run OCR in a thread pool inside the API process.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        self.status = {
+            "ready": False,
+            "backend": "local",
+            "workers": workers,
+            "warm": False,
+            "tesseract": False,
+            "pdf2image": False,
+            "reason": "OCR engine is starting"
+        }
+
+    async def start(self):
+        """
+        Validate OCR dependencies and run one tiny OCR job, so the first real
+        upload does not pay the cold-start cost.
+
+        pytesseract starts a new tesseract process for every call, so there is
+        no per-thread engine to warm. The warm-up loads the binary and its
+        language data into the OS page cache once, which every pool thread
+        then benefits from.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            status = await loop.run_in_executor(self.executor, utils.initialize_ocr_engine)
+        except Exception as e:
+            logger.error("OCR engine initialization failed: %s", e)
+            self.status["reason"] = f"OCR engine initialization failed: {str(e)}"
+            return
+        self.status.update(status)
+
+        if not status["tesseract"]:
+            self.status["reason"] = "Tesseract is not installed or not on PATH"
+        elif not status["warm"]:
+            self.status["reason"] = "OCR warm-up job failed, see the server log"
+        else:
+            self.status["ready"] = True
+            del self.status["reason"]
+
+    async def readiness(self) -> Dict[str, Any]:
+        return self.status
+
+    async def run_ocr(self, file_path: str) -> DocumentLayout:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, tracing.bind(utils.process_ocr_layout, file_path))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+class QueueOCRBackend:
+    """
+    Hand OCR to separate worker processes (see worker.py) through a durable
+    job queue and wait for the result.
+
+    The uploaded file stays in the temp directory only while the API waits
+    for the job, so workers must see the same filesystem path as the API. A
+    job the API stops waiting for is dead-lettered.
+    """
+
+    def __init__(self, queue: JobQueue, timeout: float = 300.0, poll_interval: float = 0.2,
+                 max_attempts: int = 3):
+        self.queue = queue
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+    async def start(self):
+        pass
+
+    async def readiness(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        workers = await loop.run_in_executor(None, self.queue.live_workers)
+        stats = await loop.run_in_executor(None, self.queue.stats)
+        status = {
+            "ready": workers["warm"] > 0,
+            "backend": "queue",
+            "warm_workers": workers["warm"],
+            "total_workers": workers["total"],
+            "jobs": stats
+        }
+        if not status["ready"]:
+            status["reason"] = "No warm OCR worker has checked in recently"
+        return status
+
+    async def run_ocr(self, file_path: str) -> DocumentLayout:
+        loop = asyncio.get_running_loop()
+        job_id = await loop.run_in_executor(
+            None, lambda: self.queue.enqueue({"file_path": os.path.abspath(file_path)}, self.max_attempts)
+        )
+        try:
+            with tracing.span("queue_wait", job_id=job_id) as wait:
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    job = await loop.run_in_executor(None, self.queue.get, job_id)
+                    if job is not None and job["state"] in (DONE, DEAD):
+                        break
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"OCR job {job_id} did not finish within {self.timeout:.0f}s")
+                    await asyncio.sleep(self.poll_interval)
+                wait.set(attempts=job["attempts"])
+        except (TimeoutError, asyncio.CancelledError):
+            # The caller deletes the input file once it stops waiting, so the job can never succeed
+            await loop.run_in_executor(None, self.queue.cancel, job_id, "API stopped waiting for the result")
+            raise
+
+        # Dead-lettered jobs stay in the queue for inspection
+        if job["state"] == DEAD:
+            raise Exception(job["error"] or f"OCR job {job_id} failed")
+        # The result has been consumed, keep the queue table small
+        await loop.run_in_executor(None, self.queue.delete, job_id)
+        return DocumentLayout.from_dict(job["result"]["layout"])
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from typing import Dict, Any
+
+import utils
+import mock_gemini as gemini_client
+from classifier import KeywordConfig
+
+logger = logging.getLogger(__name__)
+
+class PipelineError(Exception):
+    """
+    A document failed at a specific pipeline stage ("ocr" or "classify").
+    """
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(message)
+        self.stage = stage
+
+def extraction_fallback(ocr_text: str, error: Exception) -> Dict[str, Any]:
+    """
+    Basic extraction result with an error note, used when AI extraction fails.
+    """
+    return {
+        "error": f"AI extraction failed: {str(error)}",
+        "raw_text_preview": ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
+    }
+
+def process_document(file_path: str, config: KeywordConfig) -> Dict[str, Any]:
+    """
+    Run OCR, classification and structured data extraction on one file,
+    outside of any HTTP request.
+
+    Args:
+        file_path: Path to a PDF or image file
+        config: Document classification config
+
+    Returns:
+        Dictionary containing document_type, keyword_matches, confidence,
+        structured_data and ocr_text
+
+    Raises:
+        PipelineError: If OCR or classification fails
+    """
+    try:
+        ocr_text = utils.process_ocr(file_path)
+    except Exception as e:
+        raise PipelineError("ocr", f"OCR processing failed: {str(e)}")
+
+    try:
+        classification = utils.classify_document(ocr_text, config)
+    except Exception as e:
+        raise PipelineError("classify", f"Document classification failed: {str(e)}")
+    doc_type = classification.get("document_type", "Unknown")
+
+    try:
+        structured_data = asyncio.run(gemini_client.extract_structured_data(doc_type, ocr_text))
+    except Exception as e:
+        structured_data = extraction_fallback(ocr_text, e)
+
+    return {
+        "document_type": doc_type,
+        "keyword_matches": classification.get("keyword_counts", {}),
+        "confidence": classification.get("confidence", 0.0),
+        "structured_data": structured_data,
+        "ocr_text": ocr_text
+    }
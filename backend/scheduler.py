@@ -0,0 +1,257 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from typing import Dict, Any, List, Optional
+
+import pdf2image
+from PIL import Image
+
+import utils
+
+logger = logging.getLogger(__name__)
+
+# Cost is measured in megapixels run through OCR. Unreadable files get a
+# conservative default rather than being rejected here; OCR reports the error.
+DEFAULT_PAGE_MEGAPIXELS = 8.7  # A4 at 300 DPI
+MIN_COST = 0.5
+
+def _as_dpi(value: Any) -> Optional[float]:
+    # Pillow reports EXIF resolutions as IFDRational, which is not JSON serializable
+    try:
+        dpi = float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(dpi, 2) if math.isfinite(dpi) and dpi > 0 else None
+
+def estimate_cost(file_path: str, content_type: Optional[str]) -> Dict[str, Any]:
+    """
+    Estimate the OCR cost of a saved upload from its page count and pixel
+    dimensions, without rendering or decoding it.
+
+    Args:
+        file_path: Path to the uploaded file
+        content_type: Content type detected from the file's magic bytes
+            (StreamedUpload.detected_type), not the client's Content-Type header
+
+    Returns:
+        Dictionary containing pages, megapixels per page, dpi and total cost
+    """
+    pages = 1
+    page_megapixels = DEFAULT_PAGE_MEGAPIXELS
+    dpi = None
+    try:
+        if content_type == "application/pdf" or file_path.lower().endswith(".pdf"):
+            info = pdf2image.pdfinfo_from_path(file_path)
+            pages = min(int(info.get("Pages", 1)), utils.PDF_MAX_PAGES)
+            dpi = utils.PDF_DPI
+            # "Page size" looks like "612 x 792 pts (letter)"
+            size = info.get("Page size", "").split()
+            if len(size) >= 3 and size[1] == "x":
+                width_in, height_in = float(size[0]) / 72, float(size[2]) / 72
+                page_megapixels = width_in * dpi * height_in * dpi / 1e6
+        else:
+            # Opening only reads the header; pixels are decoded lazily
+            with Image.open(file_path) as image:
+                width, height = image.size
+                dpi = _as_dpi(image.info.get("dpi", (None,))[0])
+            page_megapixels = width * height / 1e6
+    except Exception as e:
+        logger.warning("Cost estimate fell back to defaults for %s: %s", file_path, e)
+
+    return {
+        "pages": pages,
+        "megapixels_per_page": round(page_megapixels, 2),
+        "dpi": dpi,
+        "cost": round(max(MIN_COST, pages * page_megapixels), 2)
+    }
+
+class AdmissionError(Exception):
+    """
+    A request was shed instead of queued. Carries the HTTP status to return.
+    """
+
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class Ticket:
+    """
+    Admission granted to one request; pass it back to FairScheduler.release().
+    """
+
+    __slots__ = ("client_id", "cost", "enqueued_at", "admitted_at")
+
+    def __init__(self, client_id: str, cost: float):
+        self.client_id = client_id
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+
+    @property
+    def queue_wait_ms(self) -> float:
+        return round(((self.admitted_at or time.monotonic()) - self.enqueued_at) * 1000, 1)
+
+class FairScheduler:
+    """
+    Cost-aware admission control with per-client fair queuing.
+
+    Requests are admitted while the cost in flight stays within the compute
+    budget. A request larger than the whole budget is admitted only when
+    nothing else is running. Waiting requests are served in start-time fair
+    queuing order: each client's tags advance by the cost it has been
+    admitted, so a client sending large PDFs cannot starve clients sending
+    single pages.
+
+    Work beyond the limits is shed: 429 when one client has too many requests
+    waiting, 503 when the overall queue is full or a request waits too long.
+    """
+
+    def __init__(self, budget: float, max_wait: float = 30.0, max_queued_per_client: int = 10,
+                 max_queued_cost: float = 1000.0):
+        self.budget = budget
+        self.max_wait = max_wait
+        self.max_queued_per_client = max_queued_per_client
+        self.max_queued_cost = max_queued_cost
+        self.in_flight = 0.0
+        self.running = 0
+        self.queued_cost = 0.0
+        self.queued_per_client: Dict[str, int] = {}
+        self.running_per_client: Dict[str, int] = {}
+        # Last finish tag per client, and the tag of the most recently admitted request
+        self.client_tags: Dict[str, float] = {}
+        self.virtual_time = 0.0
+        # (start tag, sequence, ticket, future)
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+
+    def _fits(self, cost: float) -> bool:
+        return self.running == 0 or self.in_flight + cost <= self.budget
+
+    def _admit(self, ticket: Ticket):
+        ticket.admitted_at = time.monotonic()
+        self.in_flight += ticket.cost
+        self.running += 1
+        self.running_per_client[ticket.client_id] = self.running_per_client.get(ticket.client_id, 0) + 1
+
+    async def acquire(self, client_id: str, cost: float) -> Ticket:
+        """
+        Wait for a fair share of the compute budget.
+
+        Raises:
+            AdmissionError: If the request is shed
+        """
+        ticket = Ticket(client_id, cost)
+        start_tag = max(self.client_tags.get(client_id, 0.0), self.virtual_time)
+        self.client_tags[client_id] = start_tag + cost
+
+        if not self._waiting and self._fits(cost):
+            self.virtual_time = start_tag
+            self._admit(ticket)
+            return ticket
+
+        if self.queued_per_client.get(client_id, 0) >= self.max_queued_per_client:
+            self.client_tags[client_id] -= cost
+            self._forget_idle_clients()
+            raise AdmissionError(429, f"Too many queued requests for client {client_id}", retry_after=5)
+        if self.queued_cost + cost > self.max_queued_cost:
+            self.client_tags[client_id] -= cost
+            self._forget_idle_clients()
+            raise AdmissionError(503, "Server is at capacity, try again later", retry_after=10)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (start_tag, next(self._sequence), ticket, future)
+        heapq.heappush(self._waiting, entry)
+        self.queued_cost += cost
+        self.queued_per_client[client_id] = self.queued_per_client.get(client_id, 0) + 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Admitted just as the wait timed out
+                return ticket
+            self._withdraw(entry)
+            raise AdmissionError(503, f"Request waited more than {self.max_wait:.0f}s for OCR capacity",
+                                 retry_after=int(self.max_wait))
+        except asyncio.CancelledError:
+            # Client went away; give back the capacity if it was already granted
+            if future.done():
+                self.release(ticket)
+            else:
+                self._withdraw(entry)
+            raise
+        return ticket
+
+    def _unqueue(self, ticket: Ticket):
+        self.queued_cost = max(0.0, self.queued_cost - ticket.cost)
+        self.queued_per_client[ticket.client_id] -= 1
+        if not self.queued_per_client[ticket.client_id]:
+            del self.queued_per_client[ticket.client_id]
+
+    def _withdraw(self, entry: tuple):
+        """
+        Remove a request that gave up waiting, undoing its queue accounting
+        and the advance of its client's fair-queuing tag.
+        """
+        ticket = entry[2]
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+        self._unqueue(ticket)
+        self.client_tags[ticket.client_id] -= ticket.cost
+        entry[3].cancel()
+        # The withdrawn request may have been blocking the head of the queue
+        self._dispatch()
+        self._forget_idle_clients()
+
+    def release(self, ticket: Ticket):
+        """
+        Return a ticket's cost to the budget and admit waiting requests.
+        """
+        self.in_flight = max(0.0, self.in_flight - ticket.cost)
+        self.running -= 1
+        self.running_per_client[ticket.client_id] -= 1
+        if not self.running_per_client[ticket.client_id]:
+            del self.running_per_client[ticket.client_id]
+        self._dispatch()
+        self._forget_idle_clients()
+
+    def _forget_idle_clients(self):
+        """
+        Drop the tags of clients with nothing queued or running, so client
+        ids do not accumulate for the life of the process. A tag at or behind
+        the virtual time is ignored by acquire() anyway, and with nothing
+        waiting there is no one to be fair against.
+        """
+        backlog = bool(self._waiting)
+        idle = [
+            client_id for client_id, tag in self.client_tags.items()
+            if (tag <= self.virtual_time or not backlog)
+            and client_id not in self.queued_per_client
+            and client_id not in self.running_per_client
+        ]
+        for client_id in idle:
+            del self.client_tags[client_id]
+
+    def _dispatch(self):
+        while self._waiting:
+            start_tag, _, ticket, future = self._waiting[0]
+            if not self._fits(ticket.cost):
+                break
+            heapq.heappop(self._waiting)
+            self._unqueue(ticket)
+            self.virtual_time = start_tag
+            self._admit(ticket)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "in_flight": round(self.in_flight, 2),
+            "running": self.running,
+            "queued": len(self._waiting),
+            "queued_cost": round(self.queued_cost, 2)
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import gzip
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import tracing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+# Bodies at least this large are compressed off the event loop
+OFFLOAD_MIN_BYTES = 64 * 1024
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode JSON with orjson when it is installed, else the standard library.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def parse_list(value: Optional[str]) -> List[str]:
+    """
+    Split a comma-separated query parameter, ignoring blanks.
+    """
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def select_fields(content: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields. Dotted paths select nested keys, e.g.
+    "structured_data.extracted_data.invoice_number"; unknown paths are skipped.
+    """
+    if not fields:
+        return content
+    selected: Dict[str, Any] = {}
+    for field in fields:
+        source = content
+        target = selected
+        parts = field.split(".")
+        for i, part in enumerate(parts):
+            if not isinstance(source, dict) or part not in source:
+                break
+            if i == len(parts) - 1:
+                target[part] = source[part]
+            else:
+                source = source[part]
+                existing = target.get(part)
+                if not isinstance(existing, dict):
+                    existing = target[part] = {}
+                target = existing
+    return selected
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick "br" or "gzip" from an Accept-Encoding header by the client's
+    q-values, with "*" covering codings it does not name. Brotli is only
+    offered when the brotli package is installed, and wins ties.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+async def json_response(request: Request, content: Any, status_code: int = 200,
+                        headers: Optional[Dict[str, str]] = None, offload: bool = False) -> Response:
+    """
+    Serialize content with the fast encoder and compress it if the client
+    accepts br or gzip. Encoding time is recorded as a "serialize" span.
+
+    Set offload for content that may be large (OCR text, layouts) to encode
+    it in a worker thread. Bodies of OFFLOAD_MIN_BYTES or more are always
+    compressed in a worker thread; zlib and brotli release the GIL while
+    they run, so the event loop keeps serving other requests.
+    """
+    headers = dict(headers or {})
+    loop = asyncio.get_running_loop()
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    with tracing.span("serialize") as span:
+        if offload:
+            body = await loop.run_in_executor(None, dumps, content)
+        else:
+            body = dumps(content)
+        span.set(bytes=len(body))
+
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            if len(body) >= OFFLOAD_MIN_BYTES:
+                body = await loop.run_in_executor(None, compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            span.set(encoding=encoding, compressed_bytes=len(body))
+        headers["Vary"] = "Accept-Encoding"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
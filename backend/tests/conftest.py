@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+# Backend modules import each other by bare name and are run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from layout import DocumentLayout, PageLayout
+
+def tesseract_data(words, block=1, par=1, line=1, conf=91.257):
+    """
+    pytesseract.image_to_data() output for one word per entry in words.
+
+    block, par and line are a number shared by every word or a list with one
+    number per word.
+    """
+    n = len(words)
+
+    def column(value):
+        return list(value) if isinstance(value, (list, tuple)) else [value] * n
+
+    return {
+        "level": [5] * n, "text": list(words), "left": list(range(n)), "top": [0] * n,
+        "width": [10] * n, "height": [10] * n, "conf": [conf] * n,
+        "block_num": column(block), "par_num": column(par), "line_num": column(line)
+    }
+
+def layout_from_words(words, block=1, par=1, line=1, paged=False, **page):
+    """
+    Single-page DocumentLayout as the OCR step would return it for words.
+
+    page is passed to PageLayout.from_tesseract (page_number, size, rotation).
+    """
+    data = tesseract_data(words, block=block, par=par, line=line)
+    return DocumentLayout([PageLayout.from_tesseract(data, **page)], paged=paged)
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+
+import pytest
+
+import batch
+from pipeline import PipelineError
+
+def fake_process_document(file_path, config):
+    name = os.path.basename(file_path)
+    if name.startswith("crash"):
+        # Simulate tesseract or a native library taking the worker down
+        os._exit(1)
+    if name.startswith("bad"):
+        logging.getLogger("utils").error("OCR processing failed for %s", file_path)
+        raise PipelineError("ocr", "OCR processing failed: No meaningful text")
+    return {"document_type": "Invoice", "keyword_matches": {"Invoice": 1}, "confidence": 0.9,
+            "structured_data": {}, "ocr_text": "Invoice"}
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    # Worker processes are forked after this, so they see the fake
+    monkeypatch.setattr(batch, "process_document", fake_process_document)
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def run(paths, output, retry_failed=False, workers=2):
+    return batch.run(paths, output, config_path=output.parent / "missing.json", workers=workers,
+                     include_text=False, retry_failed=retry_failed, warm_up=False)
+
+def test_run_records_every_file(tmp_path, pipeline):
+    output = tmp_path / "out.jsonl"
+    paths = [f"/data/doc{i}.png" for i in range(10)] + ["/data/bad.png"]
+
+    assert run(paths, output) == 1
+
+    records = {r["path"]: r for r in read_records(output)}
+    assert set(records) == set(paths)
+    assert records["/data/bad.png"]["stage"] == "ocr"
+    assert records["/data/doc0.png"]["status"] == "ok"
+
+def test_resume_skips_recorded_paths(tmp_path, pipeline):
+    output = tmp_path / "out.jsonl"
+    run(["/data/a.png"], output)
+    # An interrupted write leaves half a record behind
+    with open(output, "a") as f:
+        f.write('{"path": "/data/b.png", "sta')
+
+    run(["/data/a.png", "/data/b.png"], output)
+
+    assert [r["path"] for r in read_records(output)] == ["/data/a.png", "/data/b.png"]
+
+def test_retry_failed_replaces_error_records(tmp_path, pipeline, monkeypatch):
+    output = tmp_path / "out.jsonl"
+    assert run(["/data/ok.png", "/data/bad.png"], output) == 1
+    assert run(["/data/ok.png", "/data/bad.png"], output) == 0
+
+    # The file is fixed on disk; the retry must leave one record per path
+    monkeypatch.setattr(batch, "process_document",
+                        lambda path, config: fake_process_document(path.replace("bad", "good"), config))
+    assert run(["/data/ok.png", "/data/bad.png"], output, retry_failed=True) == 0
+
+    records = read_records(output)
+    assert sorted(r["path"] for r in records) == ["/data/bad.png", "/data/ok.png"]
+    assert all(r["status"] == "ok" for r in records)
+
+def test_worker_crash_fails_only_the_crashing_file(tmp_path, pipeline):
+    output = tmp_path / "out.jsonl"
+    paths = [f"/data/doc{i}.png" for i in range(6)] + ["/data/crash.png"] + [f"/data/doc{i}.png" for i in range(6, 12)]
+
+    assert run(paths, output, workers=3) == 1
+
+    records = {r["path"]: r for r in read_records(output)}
+    assert len(read_records(output)) == len(paths)
+    assert records["/data/crash.png"] == {"path": "/data/crash.png", "status": "error", "stage": "worker",
+                                          "error": "Worker process crashed while processing this file"}
+    assert all(records[p]["status"] == "ok" for p in paths if p != "/data/crash.png")
+
+def test_worker_logs_stay_off_stderr(tmp_path, pipeline, capfd):
+    # As set up by utils' logging.basicConfig when run from the command line
+    handler = logging.StreamHandler()
+    logging.getLogger().addHandler(handler)
+    try:
+        run(["/data/bad.png"], tmp_path / "out.jsonl", workers=1)
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+    assert "OCR processing failed for" not in capfd.readouterr().err
+
+def test_iter_manifest(tmp_path):
+    manifest = tmp_path / "paths.txt"
+    manifest.write_text("# scans\n\na.png\n/abs/b.pdf\n")
+
+    assert list(batch.iter_manifest(manifest)) == [str(tmp_path / "a.png"), "/abs/b.pdf"]
@@ -0,0 +1,88 @@
+import math
+import random
+
+import pytest
+
+from classifier import KeywordClassifier
+
+CONFIG = {
+    "Invoice": ["Invoice Number", "Total", "Due", "Amount"],
+    "Bank Statement": ["Account Number", "Balance", "Statement", "Amount"],
+    "Contract": ["Agreement", "Party", "Parties", "Terms"],
+}
+
+def test_counts_match_str_count():
+    rng = random.Random(7)
+    alphabet = "ab c"
+    terms = list({"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))).strip() or "a" for _ in range(60)})
+    text = "".join(rng.choice(alphabet + "AB") for _ in range(2000))
+    classifier = KeywordClassifier({"T": terms})
+
+    counts = classifier.count_terms(text)
+
+    assert counts.tolist() == [text.lower().count(term) for term in classifier.terms]
+
+def test_overlapping_and_nested_terms_are_each_counted():
+    classifier = KeywordClassifier({"Invoice": ["Total", "Total Amount", "Amount", "aa"]})
+
+    counts = dict(zip(classifier.terms, classifier.count_terms("TOTAL AMOUNT due, subtotal: aaa").tolist()))
+
+    assert counts == {"total": 2, "total amount": 1, "amount": 1, "aa": 1}
+
+def test_shared_keywords_weigh_less():
+    classifier = KeywordClassifier(CONFIG)
+    invoice = classifier.doc_types.index("Invoice")
+
+    shared = classifier.weights[invoice, classifier.terms.index("amount")]
+    unique = classifier.weights[invoice, classifier.terms.index("total")]
+
+    assert 0 < shared < unique
+
+def test_explicit_weights_are_used_as_given():
+    classifier = KeywordClassifier({"Invoice": {"Total": 3.0, "Due": 0.5}, "Contract": ["Total"]})
+
+    assert classifier.weights[0].tolist() == [3.0, 0.5]
+    result = classifier.classify("total")
+    assert result["document_type"] == "Invoice"
+    assert result["detailed_matches"]["Invoice"]["score"] == round(3.0 * math.log(2), 4)
+
+def test_softmax_confidence_includes_unknown():
+    classifier = KeywordClassifier({"A": {"alpha": 2.0}, "B": {"beta": 1.0}, "C": {"gamma": 1.0}})
+
+    result = classifier.classify("alpha beta")
+
+    # Scores are weight * log1p(count): A = 2 ln 2, B = ln 2, C = 0 (not matched).
+    # Softmax over A, B and an Unknown logit at 0: 1 / (1 + 1/2 + 1/4)
+    assert result["document_type"] == "A"
+    assert result["confidence"] == pytest.approx(4 / 7)
+    assert set(result["detailed_matches"]) == {"A", "B"}
+    assert result["keyword_counts"] == {"A": 1, "B": 1, "C": 0}
+
+def test_confidence_does_not_shrink_with_unmatched_types():
+    small = KeywordClassifier(CONFIG)
+    large = KeywordClassifier({**CONFIG, **{f"Type {i}": [f"keyword{i}"] for i in range(500)}})
+    text = "Invoice Number 42, Total amount due"
+
+    assert large.classify(text)["confidence"] == pytest.approx(small.classify(text)["confidence"], rel=0.05)
+
+def test_detailed_matches():
+    result = KeywordClassifier(CONFIG).classify("Invoice Number 7. Total: 10. Total due. Amount")
+
+    assert result["document_type"] == "Invoice"
+    assert result["detailed_matches"]["Invoice"]["matched_keywords"] == ["Invoice Number", "Total", "Due", "Amount"]
+    assert result["detailed_matches"]["Invoice"]["count"] == 5
+    assert result["detailed_matches"]["Invoice"]["total_possible"] == 4
+    assert result["detailed_matches"]["Bank Statement"]["matched_keywords"] == ["Amount"]
+    assert "Contract" not in result["detailed_matches"]
+
+@pytest.mark.parametrize("text", ["", "   ", "nothing relevant here"])
+def test_unknown(text):
+    result = KeywordClassifier(CONFIG).classify(text)
+
+    assert result["document_type"] == "Unknown"
+    assert result["confidence"] == 0.0
+
+def test_empty_config():
+    result = KeywordClassifier({}).classify("Total")
+
+    assert result["document_type"] == "Unknown"
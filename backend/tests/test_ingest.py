@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+
+import pytest
+from starlette.requests import Request
+
+import ingest
+from ingest import IngestError
+
+BOUNDARY = "testboundary"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+PDF = b"%PDF-1.4\n" + b"x" * 200
+
+def multipart(*parts):
+    body = b""
+    for name, filename, content_type, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if content_type is not None:
+            body += f"Content-Type: {content_type}\r\n".encode()
+        body += b"\r\n" + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+def make_request(body, content_type=f"multipart/form-data; boundary={BOUNDARY}", chunk_size=7):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+def receive(tmp_path, body, **kwargs):
+    return asyncio.run(ingest.receive_upload(make_request(body), tmp_path, **kwargs))
+
+def test_streams_file_and_hashes_it(tmp_path):
+    upload = receive(tmp_path, multipart(("note", None, None, b"hi"), ("file", "scan.png", "image/png", PNG)))
+
+    assert upload.filename == "scan.png"
+    assert upload.detected_type == "image/png"
+    assert upload.size == len(PNG)
+    assert upload.content_hash == hashlib.sha256(PNG).hexdigest()
+    assert upload.path.read_bytes() == PNG
+    assert list(tmp_path.iterdir()) == [upload.path]
+
+@pytest.mark.parametrize("filename", ["scan.pdf", "scan", None])
+def test_file_is_named_by_detected_type(tmp_path, filename):
+    upload = receive(tmp_path, multipart(("file", filename, "image/png", PNG)))
+
+    assert upload.path.suffix == ".png"
+    assert upload.filename == filename
+
+def test_jpg_alias_is_accepted(tmp_path):
+    jpeg = b"\xff\xd8\xff\xe0" + b"\x00" * 50
+    upload = receive(tmp_path, multipart(("file", "photo.jpeg", "image/jpg", jpeg)))
+
+    assert upload.detected_type == "image/jpeg"
+    assert upload.path.suffix == ".jpg"
+
+def test_mislabeled_file_is_rejected(tmp_path):
+    with pytest.raises(IngestError, match=r"does not match declared type image/png \(looks like application/pdf\)"):
+        receive(tmp_path, multipart(("file", "scan.png", "image/png", PDF)))
+    assert list(tmp_path.iterdir()) == []
+
+def test_unknown_content_is_rejected(tmp_path):
+    with pytest.raises(IngestError, match="does not match declared type application/pdf"):
+        receive(tmp_path, multipart(("file", "doc.pdf", "application/pdf", b"hello world, not a pdf")))
+    assert list(tmp_path.iterdir()) == []
+
+def test_unsupported_declared_type_is_rejected(tmp_path):
+    with pytest.raises(IngestError, match="Unsupported file type: text/plain"):
+        receive(tmp_path, multipart(("file", "notes.txt", "text/plain", b"hello")))
+    assert list(tmp_path.iterdir()) == []
+
+def test_file_shorter_than_longest_signature(tmp_path):
+    # A bare JPEG signature is shorter than the PNG one
+    upload = receive(tmp_path, multipart(("file", "tiny.jpg", "image/jpeg", b"\xff\xd8\xff")))
+    assert upload.detected_type == "image/jpeg"
+
+    with pytest.raises(IngestError, match="does not match declared type application/pdf"):
+        receive(tmp_path, multipart(("file", "tiny.pdf", "application/pdf", b"%PD")))
+    assert list(tmp_path.iterdir()) == [upload.path]
+
+def test_size_limit_is_enforced_while_streaming(tmp_path):
+    with pytest.raises(IngestError, match="File size too large"):
+        receive(tmp_path, multipart(("file", "scan.png", "image/png", PNG)), max_bytes=100)
+    assert list(tmp_path.iterdir()) == []
+
+def test_content_length_precheck(tmp_path):
+    request = make_request(b"")
+    request.scope["headers"][1] = (b"content-length", str(ingest.MAX_UPLOAD_BYTES * 2).encode())
+    with pytest.raises(IngestError, match="File size too large"):
+        asyncio.run(ingest.receive_upload(request, tmp_path))
+
+def test_missing_field(tmp_path):
+    with pytest.raises(IngestError, match="No file provided in form field 'file'"):
+        receive(tmp_path, multipart(("document", "scan.png", "image/png", PNG)))
+
+def test_empty_file(tmp_path):
+    with pytest.raises(IngestError, match="Uploaded file is empty"):
+        receive(tmp_path, multipart(("file", "scan.png", "image/png", b"")))
+    assert list(tmp_path.iterdir()) == []
+
+def test_not_multipart(tmp_path):
+    request = make_request(PNG, content_type="image/png")
+    with pytest.raises(IngestError, match="Expected a multipart/form-data upload"):
+        asyncio.run(ingest.receive_upload(request, tmp_path))
+
+def test_truncated_upload(tmp_path):
+    body = multipart(("file", "scan.png", "image/png", PNG))
+    with pytest.raises(IngestError):
+        receive(tmp_path, body[:len(body) // 2])
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from job_queue import JobQueue, QUEUED, LEASED, DONE, DEAD
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "queue.db", retry_backoff=0.01)
+
+def test_lease_complete(queue):
+    job_id = queue.enqueue({"file_path": "/tmp/a.png"})
+
+    job = queue.lease("w1")
+    assert job.id == job_id
+    assert job.payload == {"file_path": "/tmp/a.png"}
+    assert job.attempts == 1
+    assert queue.lease("w2") is None
+
+    assert queue.complete(job, {"text": "ok"})
+    stored = queue.get(job_id)
+    assert stored["state"] == DONE
+    assert stored["result"] == {"text": "ok"}
+
+def test_fail_retries_with_backoff_then_dead_letters(queue):
+    job_id = queue.enqueue({}, max_attempts=2)
+
+    assert queue.fail(queue.lease("w1"), "boom") == QUEUED
+    # Not available again until the backoff has passed
+    assert queue.get(job_id)["state"] == QUEUED
+    time.sleep(0.02)
+    job = queue.lease("w1")
+    assert job.attempts == 2
+
+    assert queue.fail(job, "boom") == DEAD
+    assert [dead["id"] for dead in queue.dead_letters()] == [job_id]
+
+def test_fail_without_retry_dead_letters_immediately(queue):
+    job_id = queue.enqueue({}, max_attempts=3)
+
+    assert queue.fail(queue.lease("w1"), "Unsupported file format", retry=False) == DEAD
+    assert queue.get(job_id)["attempts"] == 1
+    assert queue.get(job_id)["error"] == "Unsupported file format"
+
+def test_expired_lease_is_handed_to_another_worker(queue):
+    job_id = queue.enqueue({}, max_attempts=2)
+    first = queue.lease("w1", lease_seconds=0.01)
+    time.sleep(0.02)
+
+    second = queue.lease("w2", lease_seconds=0.01)
+    assert second.id == job_id and second.attempts == 2
+    # The first worker no longer owns the job
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first, {})
+
+    # Final lease expires as well: dead-lettered instead of leased again
+    time.sleep(0.02)
+    assert queue.lease("w3") is None
+    assert queue.get(job_id)["state"] == DEAD
+
+def test_cancel_dead_letters_and_revokes_lease(queue):
+    queued_id = queue.enqueue({})
+    leased = queue.lease("w1")
+    other_id = queue.enqueue({})
+
+    assert queue.cancel(leased.id, "API stopped waiting")
+    assert queue.cancel(other_id, "API stopped waiting")
+    assert queue.get(queued_id)["state"] == DEAD
+    assert not queue.heartbeat(leased)
+    assert not queue.complete(leased, {})
+    assert queue.lease("w2") is None
+    # Finished jobs are left alone
+    assert not queue.cancel(queued_id, "again")
+
+def test_delete_only_removes_finished_jobs(queue):
+    job_id = queue.enqueue({})
+    queue.delete(job_id)
+    assert queue.get(job_id)["state"] == QUEUED
+
+    queue.complete(queue.lease("w1"), {})
+    queue.delete(job_id)
+    assert queue.get(job_id) is None
+
+def test_live_workers(queue):
+    queue.register_worker("w1", warm=True)
+    queue.register_worker("w2", warm=False)
+    assert queue.live_workers() == {"total": 2, "warm": 1}
+
+    queue.unregister_worker("w1")
+    assert queue.live_workers() == {"total": 1, "warm": 0}
+    assert queue.stats() == {QUEUED: 0, LEASED: 0, DONE: 0, DEAD: 0}
@@ -0,0 +1,33 @@
+from conftest import layout_from_words, tesseract_data
+from layout import DocumentLayout, PageLayout
+
+WORDS = ["Invoice", "INV-1", "Total", "Terms"]
+LINES = {"block": [1, 1, 1, 2], "line": [1, 1, 2, 1]}
+
+def test_page_text_from_layout():
+    page = layout_from_words(WORDS, **LINES).pages[0]
+
+    assert len(page) == 4
+    assert page.word(1) == "INV-1"
+    assert page.text == "Invoice INV-1\nTotal\n\nTerms"
+
+def test_non_words_and_blanks_are_skipped():
+    data = tesseract_data(["Invoice", "  "])
+    data["level"][0] = 4
+
+    assert len(PageLayout.from_tesseract(data)) == 0
+    assert PageLayout.from_tesseract(data).text == ""
+
+def test_round_trip():
+    layout = layout_from_words(WORDS, paged=True, page_number=1, size=(100, 200), rotation=90, **LINES)
+
+    restored = DocumentLayout.from_dict(layout.to_dict())
+
+    assert restored.to_dict() == layout.to_dict()
+    assert restored.to_dict()["pages"][0]["conf"][0] == 91.26
+    assert restored.text == layout.text == "--- Page 1 ---\nInvoice INV-1\nTotal\n\nTerms"
+
+def test_document_text_is_built_once():
+    layout = layout_from_words(WORDS, **LINES)
+
+    assert layout.text is layout.text
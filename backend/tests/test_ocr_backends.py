@@ -0,0 +1,44 @@
+import asyncio
+
+import utils
+from ocr_backends import LocalOCRBackend
+
+def start(monkeypatch, initialize):
+    monkeypatch.setattr(utils, "initialize_ocr_engine", initialize)
+    backend = LocalOCRBackend(2)
+
+    async def scenario():
+        await backend.start()
+        return await backend.readiness()
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        backend.shutdown()
+
+def test_ready_after_warm_up(monkeypatch):
+    status = start(monkeypatch, lambda: {"tesseract": True, "pdf2image": True, "warm": True})
+
+    assert status["ready"] is True
+    assert status["workers"] == 2
+    assert "reason" not in status
+
+def test_missing_tesseract_reports_reason(monkeypatch):
+    status = start(monkeypatch, lambda: {"tesseract": False, "pdf2image": True, "warm": False})
+
+    assert status["ready"] is False
+    assert status["reason"] == "Tesseract is not installed or not on PATH"
+
+def test_failed_warm_up_reports_reason(monkeypatch):
+    status = start(monkeypatch, lambda: {"tesseract": True, "pdf2image": True, "warm": False})
+
+    assert status["ready"] is False
+    assert "warm-up" in status["reason"]
+
+def test_initialization_error_reports_reason(monkeypatch):
+    def broken():
+        raise OSError("permission denied")
+    status = start(monkeypatch, broken)
+
+    assert status["ready"] is False
+    assert status["reason"] == "OCR engine initialization failed: permission denied"
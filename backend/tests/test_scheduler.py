@@ -0,0 +1,192 @@
+import asyncio
+import json
+
+import pytest
+from PIL import Image, TiffImagePlugin
+
+import scheduler
+from scheduler import AdmissionError, FairScheduler
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_estimate_cost_exif_only_jpeg(tmp_path):
+    path = tmp_path / "scan.jpg"
+    exif = Image.Exif()
+    exif[0x011A] = TiffImagePlugin.IFDRational(300, 1)  # XResolution
+    exif[0x011B] = TiffImagePlugin.IFDRational(300, 1)  # YResolution
+    exif[0x0128] = 2  # ResolutionUnit: inches
+    Image.new("RGB", (1000, 500), "white").save(path, "JPEG", exif=exif)
+
+    cost = scheduler.estimate_cost(str(path), "image/jpeg")
+
+    assert cost["dpi"] == 300.0
+    assert type(cost["dpi"]) is float
+    assert cost["megapixels_per_page"] == 0.5
+    json.dumps(cost)
+
+def test_estimate_cost_without_dpi(tmp_path):
+    path = tmp_path / "scan.png"
+    Image.new("RGB", (2000, 1000), "white").save(path, "PNG")
+
+    cost = scheduler.estimate_cost(str(path), "image/png")
+
+    assert cost["dpi"] is None
+    assert cost["cost"] == 2.0
+
+def test_estimate_cost_unreadable_file_uses_default(tmp_path):
+    path = tmp_path / "broken.png"
+    path.write_bytes(b"not an image")
+
+    cost = scheduler.estimate_cost(str(path), "image/png")
+
+    assert cost["cost"] == scheduler.DEFAULT_PAGE_MEGAPIXELS
+
+def test_admits_within_budget_and_queues_beyond():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+        first = await fs.acquire("a", 6)
+        second = await fs.acquire("a", 4)
+        waiter = asyncio.ensure_future(fs.acquire("b", 3))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert fs.stats()["queued"] == 1
+
+        fs.release(first)
+        third = await waiter
+        assert fs.stats() == {"budget": 10, "in_flight": 7.0, "running": 2, "queued": 0, "queued_cost": 0.0}
+        fs.release(second)
+        fs.release(third)
+    run(scenario())
+
+def test_oversized_request_runs_alone():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+        big = await fs.acquire("a", 50)
+        assert fs.stats()["running"] == 1
+        fs.release(big)
+    run(scenario())
+
+def test_light_client_is_not_starved_by_heavy_client():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+        blocker = await fs.acquire("heavy", 10)
+        order = []
+
+        async def request(client, cost):
+            ticket = await fs.acquire(client, cost)
+            order.append(client)
+            fs.release(ticket)
+
+        tasks = [asyncio.ensure_future(request("heavy", 10)) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(request("light", 1)))
+        await asyncio.sleep(0)
+        fs.release(blocker)
+        await asyncio.gather(*tasks)
+        return order
+    order = run(scenario())
+    assert order.index("light") < 2
+
+def test_per_client_queue_limit():
+    async def scenario():
+        fs = FairScheduler(budget=10, max_queued_per_client=1)
+        blocker = await fs.acquire("a", 10)
+        waiter = asyncio.ensure_future(fs.acquire("b", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionError) as e:
+            await fs.acquire("b", 1)
+        assert e.value.status_code == 429
+        fs.release(blocker)
+        fs.release(await waiter)
+    run(scenario())
+
+def test_global_queue_limit():
+    async def scenario():
+        fs = FairScheduler(budget=10, max_queued_cost=5)
+        blocker = await fs.acquire("a", 10)
+        with pytest.raises(AdmissionError) as e:
+            await fs.acquire("b", 6)
+        assert e.value.status_code == 503
+        assert "b" not in fs.client_tags
+        fs.release(blocker)
+    run(scenario())
+
+def test_timed_out_waiters_are_removed():
+    async def scenario():
+        fs = FairScheduler(budget=10, max_wait=0.05, max_queued_per_client=2)
+        blocker = await fs.acquire("a", 10)
+
+        results = await asyncio.gather(fs.acquire("b", 3), fs.acquire("b", 3), return_exceptions=True)
+        assert all(isinstance(r, AdmissionError) and r.status_code == 503 for r in results)
+        assert fs.stats()["queued"] == 0
+        assert fs.queued_cost == 0.0
+        assert fs.queued_per_client == {}
+        assert "b" not in fs.client_tags
+
+        # The client can queue again instead of getting a stale 429
+        fs.max_wait = 5
+        waiter = asyncio.ensure_future(fs.acquire("b", 3))
+        await asyncio.sleep(0)
+        assert fs.stats()["queued"] == 1
+        fs.release(blocker)
+        fs.release(await waiter)
+    run(scenario())
+
+def test_cancelled_waiter_is_removed_and_unblocks_queue():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+        running = await fs.acquire("a", 6)
+        # Too big to fit next to the running request, so it blocks the head of the queue
+        big = asyncio.ensure_future(fs.acquire("b", 8))
+        await asyncio.sleep(0)
+        small = asyncio.ensure_future(fs.acquire("c", 2))
+        await asyncio.sleep(0)
+        assert fs.stats()["queued"] == 2
+
+        big.cancel()
+        ticket = await asyncio.wait_for(small, timeout=1)
+        assert fs.stats()["queued"] == 0
+        assert fs.queued_per_client == {}
+        assert "b" not in fs.client_tags
+        fs.release(ticket)
+        fs.release(running)
+        assert fs.stats()["in_flight"] == 0
+    run(scenario())
+
+def test_client_tags_are_dropped_once_traffic_drains():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+
+        async def request(client, cost):
+            ticket = await fs.acquire(client, cost)
+            await asyncio.sleep(0.001)
+            fs.release(ticket)
+
+        # Rotating client ids, with and without contention
+        await asyncio.gather(*[request(f"client-{i}", 4) for i in range(50)])
+        for i in range(50, 100):
+            await request(f"client-{i}", 1)
+        return fs
+    fs = run(scenario())
+
+    assert fs.client_tags == {}
+    assert fs.queued_per_client == {}
+    assert fs.running_per_client == {}
+
+def test_busy_client_keeps_its_tag():
+    async def scenario():
+        fs = FairScheduler(budget=10)
+        heavy = await fs.acquire("heavy", 10)
+        waiter = asyncio.ensure_future(fs.acquire("heavy", 10))
+        light = asyncio.ensure_future(fs.acquire("light", 1))
+        await asyncio.sleep(0)
+        assert fs.client_tags["heavy"] == 20
+        fs.release(heavy)
+        # The light client starts at the current virtual time and goes first
+        fs.release(await light)
+        assert "light" not in fs.client_tags
+        assert "heavy" in fs.client_tags
+        fs.release(await waiter)
+        assert fs.client_tags == {}
+    run(scenario())
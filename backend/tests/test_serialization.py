@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+from starlette.requests import Request
+
+import serialization
+
+class FakeBrotli:
+    @staticmethod
+    def compress(body, quality):
+        return b"br:" + body
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", FakeBrotli)
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0.8, gzip;q=0.9", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0.1", "gzip"),
+    ("gzip;q=0, *", "br"),
+    ("BR ; Q=0.7", "br"),
+    ("gzip;q=0, br;q=0", None),
+    ("gzip;q=abc", None),
+])
+def test_negotiate_encoding(with_brotli, header, expected):
+    assert serialization.negotiate_encoding(header) == expected
+
+@pytest.mark.parametrize("header, expected", [
+    ("br", None),
+    ("br, gzip;q=0.1", "gzip"),
+    ("*", "gzip"),
+])
+def test_negotiate_without_brotli(without_brotli, header, expected):
+    assert serialization.negotiate_encoding(header) == expected
+
+def test_select_fields():
+    content = {"document_type": "Invoice", "structured_data": {"extracted_data": {"total": "1"}, "model": "x"},
+               "processing_info": {"file_name": "a.png", "file_size": 3}}
+
+    selected = serialization.select_fields(
+        content, ["document_type", "structured_data.extracted_data.total", "processing_info.file_name", "nope.x"]
+    )
+
+    assert selected == {"document_type": "Invoice", "structured_data": {"extracted_data": {"total": "1"}},
+                        "processing_info": {"file_name": "a.png"}}
+    assert serialization.select_fields(content, []) is content
+
+def make_request(accept_encoding):
+    return Request({"type": "http", "method": "POST", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+def render(content, accept_encoding="gzip", **kwargs):
+    return asyncio.run(serialization.json_response(make_request(accept_encoding), content, **kwargs))
+
+def test_small_bodies_are_not_compressed():
+    response = render({"a": 1})
+
+    assert response.body == b'{"a":1}'
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_gzip_response(without_brotli):
+    content = {"text": "invoice total " * 200}
+
+    response = render(content, "br;q=1.0, gzip;q=0.5", headers={"X-Queue-Wait-Ms": "0"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["x-queue-wait-ms"] == "0"
+    assert json.loads(gzip.decompress(response.body)) == content
+
+def test_large_bodies_are_encoded_and_compressed_off_the_loop(monkeypatch):
+    threads = []
+    dumps, compress = serialization.dumps, serialization.compress
+
+    def spy(fn):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(serialization, "dumps", spy(dumps))
+    monkeypatch.setattr(serialization, "compress", spy(compress))
+    content = {"text": "x" * (serialization.OFFLOAD_MIN_BYTES * 2)}
+
+    response = render(content, offload=True)
+
+    assert len(threads) == 2
+    assert all(thread is not threading.main_thread() for thread in threads)
+    assert json.loads(gzip.decompress(response.body)) == content
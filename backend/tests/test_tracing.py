@@ -0,0 +1,54 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+def sampled_trace():
+    trace = tracing.Trace("test", sampled=True)
+    tracing._current_trace.set(trace)
+    return trace
+
+def test_concurrent_sampled_calls_both_return():
+    trace = sampled_trace()
+    both_running = threading.Barrier(2, timeout=5)
+
+    def work(n):
+        both_running.wait()
+        return n * 2
+
+    try:
+        calls = [tracing.bind(work, 1), tracing.bind(work, 2)]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = [f.result() for f in [pool.submit(call) for call in calls]]
+    finally:
+        tracing._current_trace.set(None)
+
+    assert results == [2, 4]
+    # Only one call could hold the profiler
+    assert len(trace.profiles) == 1
+
+def test_unavailable_profiler_does_not_fail_the_call(monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(tracing.cProfile, "Profile", BusyProfile)
+    trace = sampled_trace()
+    try:
+        assert tracing.bind(lambda: "ok")() == "ok"
+    finally:
+        tracing._current_trace.set(None)
+
+    assert trace.profiles == []
+    assert not tracing._profiler_lock.locked()
+
+def test_bind_keeps_trace_in_worker_thread():
+    trace = tracing.Trace("test")
+    tracing._current_trace.set(trace)
+    try:
+        call = tracing.bind(tracing.current_trace)
+    finally:
+        tracing._current_trace.set(None)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(call).result() is trace
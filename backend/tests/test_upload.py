@@ -0,0 +1,104 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import main
+import utils
+from conftest import layout_from_words
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+TEXT = "Invoice Number INV-1 Total Amount Due"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    ocr_calls = []
+
+    def fake_ocr(path):
+        ocr_calls.append(path)
+        return layout_from_words(TEXT.split())
+
+    monkeypatch.setattr(utils, "process_ocr_layout", fake_ocr)
+    monkeypatch.setattr(utils, "initialize_ocr_engine", lambda: {"tesseract": True, "pdf2image": True, "warm": True})
+    monkeypatch.setattr(main, "OCR_WORKERS", 1)
+    monkeypatch.setattr(main, "DOCUMENT_STORE_PATH", str(tmp_path / "documents.db"))
+    with TestClient(main.app) as client:
+        client.ocr_calls = ocr_calls
+        yield client
+
+def upload(client, data=PNG, **params):
+    return client.post("/upload", params=params, files={"file": ("scan.png", io.BytesIO(data), "image/png")})
+
+def test_upload_and_dedup(client):
+    first = upload(client)
+    assert first.status_code == 200
+    assert first.json()["document_type"] == "Invoice"
+    assert first.json()["processing_info"]["cached"] is False
+
+    second = upload(client)
+    assert second.json()["processing_info"]["cached"] is True
+    assert second.json()["structured_data"] == first.json()["structured_data"]
+    assert len(client.ocr_calls) == 1
+
+    document_id = first.json()["processing_info"]["document_id"]
+    assert client.get(f"/documents/{document_id}").json()["ocr_text"] == TEXT
+    assert client.get("/documents/search", params={"q": "invoice"}).json()["count"] == 1
+
+def test_failed_extraction_is_not_cached(client, monkeypatch):
+    extract = main.gemini_client.extract_structured_data
+    failures = [RuntimeError("transient upstream 503")]
+
+    async def flaky(doc_type, ocr_text):
+        if failures:
+            raise failures.pop()
+        return await extract(doc_type, ocr_text)
+    monkeypatch.setattr(main.gemini_client, "extract_structured_data", flaky)
+
+    first = upload(client)
+    assert first.status_code == 200
+    assert first.json()["structured_data"]["error"] == "AI extraction failed: transient upstream 503"
+    assert "document_id" not in first.json()["processing_info"]
+
+    second = upload(client)
+    assert second.json()["processing_info"]["cached"] is False
+    assert "error" not in second.json()["structured_data"]
+    assert len(client.ocr_calls) == 2
+
+def test_field_selection_and_extras(client):
+    response = upload(client, fields="document_type,processing_info.file_name", include="ocr_text,layout")
+
+    body = response.json()
+    assert set(body) == {"document_type", "processing_info", "ocr_text", "layout"}
+    assert body["processing_info"] == {"file_name": "scan.png"}
+    assert body["ocr_text"] == TEXT
+    assert body["layout"]["pages"][0]["words"] == TEXT.split()
+    assert response.headers["x-estimated-cost"]
+
+def test_unknown_include_is_rejected(client):
+    response = upload(client, include="layout,bogus")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown include: bogus. Allowed: layout, ocr_text"
+
+def test_client_id_header_is_ignored_unless_trusted(monkeypatch):
+    request = Request({"type": "http", "headers": [(b"x-client-id", b"tenant-a")], "client": ("10.0.0.5", 1234)})
+
+    assert main.client_identity(request) == "10.0.0.5"
+    monkeypatch.setattr(main, "TRUST_CLIENT_ID_HEADER", True)
+    assert main.client_identity(request) == "tenant-a"
+
+def test_resources_are_opened_on_startup_and_closed_on_shutdown(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "initialize_ocr_engine", lambda: {"tesseract": True, "pdf2image": True, "warm": True})
+    monkeypatch.setattr(main, "DOCUMENT_STORE_PATH", str(tmp_path / "documents.db"))
+    assert main.DOCUMENT_STORE is None and main.OCR_BACKEND is None
+
+    for _ in range(2):
+        with TestClient(main.app) as client:
+            store = main.DOCUMENT_STORE
+            executor = main.OCR_BACKEND.executor
+            assert client.get("/documents/search", params={"q": "invoice"}).json()["count"] == 0
+        assert main.DOCUMENT_STORE is None and main.OCR_BACKEND is None
+        assert store._connections == []
+        with pytest.raises(RuntimeError):
+            executor.submit(print)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+import utils
+import worker
+from conftest import layout_from_words
+from job_queue import JobQueue, QUEUED, LEASED, DONE, DEAD
+from layout import DocumentLayout
+from ocr_backends import QueueOCRBackend
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "queue.db", retry_backoff=0.01)
+
+def run_one(queue, lease_seconds=60.0):
+    w = worker.Worker(queue, "w1", lease_seconds=lease_seconds)
+    w.process(queue.lease("w1", lease_seconds))
+    return w
+
+def test_successful_job_records_layout(queue, monkeypatch):
+    monkeypatch.setattr(utils, "process_ocr_layout", lambda path: layout_from_words(["Invoice", "Total"]))
+    job_id = queue.enqueue({"file_path": "/tmp/a.png"})
+
+    run_one(queue)
+
+    job = queue.get(job_id)
+    assert job["state"] == DONE
+    assert DocumentLayout.from_dict(job["result"]["layout"]).text == "Invoice Total"
+
+def test_input_errors_are_not_retried(queue, monkeypatch):
+    def unreadable(path):
+        raise utils.OCRInputError("No meaningful text could be extracted from the document")
+    monkeypatch.setattr(utils, "process_ocr_layout", unreadable)
+    job_id = queue.enqueue({"file_path": "/tmp/a.png"}, max_attempts=3)
+
+    run_one(queue)
+
+    job = queue.get(job_id)
+    assert job["state"] == DEAD
+    assert job["attempts"] == 1
+    assert job["error"] == "No meaningful text could be extracted from the document"
+
+def test_other_errors_are_retried(queue, monkeypatch):
+    def flaky(path):
+        raise RuntimeError("tesseract crashed")
+    monkeypatch.setattr(utils, "process_ocr_layout", flaky)
+    job_id = queue.enqueue({"file_path": "/tmp/a.png"}, max_attempts=3)
+
+    run_one(queue)
+
+    assert queue.get(job_id)["state"] == QUEUED
+
+def test_missing_file_is_an_input_error(tmp_path):
+    with pytest.raises(utils.OCRInputError):
+        utils.process_ocr_layout(str(tmp_path / "gone.png"))
+
+def test_unsupported_format_is_an_input_error(tmp_path):
+    path = tmp_path / "scan"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n")
+    with pytest.raises(utils.OCRInputError):
+        utils.process_ocr_layout(str(path))
+
+def test_busy_worker_stays_live(queue, monkeypatch):
+    def slow(path):
+        time.sleep(0.3)
+        return layout_from_words(["Invoice"])
+    monkeypatch.setattr(utils, "process_ocr_layout", slow)
+    monkeypatch.setattr(worker, "LIVENESS_INTERVAL", 0.05)
+    queue.enqueue({"file_path": "/tmp/a.png"})
+    w = worker.Worker(queue, "w1")
+    w.register(force=True)
+    registered_at = queue._connection().execute("SELECT last_seen FROM workers").fetchone()["last_seen"]
+
+    w.process(queue.lease("w1"))
+
+    last_seen = queue._connection().execute("SELECT last_seen FROM workers").fetchone()["last_seen"]
+    assert last_seen > registered_at + 0.1
+
+def test_backend_dead_letters_job_it_stops_waiting_for(queue):
+    backend = QueueOCRBackend(queue, timeout=0.05, poll_interval=0.01)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(backend.run_ocr("/tmp/a.png"))
+
+    [dead] = queue.dead_letters()
+    assert dead["error"] == "API stopped waiting for the result"
+    assert queue.lease("w1") is None
+
+def test_backend_returns_worker_result(queue, monkeypatch):
+    monkeypatch.setattr(utils, "process_ocr_layout", lambda path: layout_from_words(["Bank", "Statement"]))
+    backend = QueueOCRBackend(queue, timeout=5, poll_interval=0.01)
+
+    async def scenario():
+        task = asyncio.ensure_future(backend.run_ocr("/tmp/a.png"))
+        while queue.stats()[QUEUED] == 0:
+            await asyncio.sleep(0.01)
+        run_one(queue)
+        return await task
+
+    assert asyncio.run(scenario()).text == "Bank Statement"
+    assert queue.stats() == {QUEUED: 0, LEASED: 0, DONE: 0, DEAD: 0}
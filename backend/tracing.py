@@ -0,0 +1,221 @@
+import cProfile
+import contextvars
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Tracing is off by default; when off, span() is a context-variable lookup
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "").lower() in ("1", "true", "yes")
+# Fraction of traced requests whose OCR work is run under cProfile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+# Sampled profiles are only kept for requests slower than this
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "2000"))
+# Number of slow-request profiles kept in memory for the debug endpoint
+MAX_PROFILES = int(os.getenv("MAX_PROFILES", "20"))
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+class Span:
+    """
+    A timed pipeline stage within a trace.
+    """
+
+    __slots__ = ("name", "start", "duration_ms", "attributes", "thread")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "thread": self.thread,
+            "attributes": self.attributes
+        }
+
+class _NullSpan:
+    """
+    Stand-in yielded by span() when no trace is active.
+    """
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Trace:
+    """
+    Spans and sampled profiles collected for one request.
+    """
+
+    def __init__(self, name: str, sampled: bool = False):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.spans: List[Span] = []
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_profile(self, profile: cProfile.Profile):
+        with self._lock:
+            self.profiles.append(profile)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self) -> str:
+        """
+        Format top-level span durations as a Server-Timing header value.
+        """
+        parts = [f"total;dur={self.duration_ms:.1f}"]
+        for span in self.spans:
+            if "." not in span.name:
+                parts.append(f"{span.name};dur={span.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": round(self.duration_ms, 3),
+            "sampled": self.sampled,
+            "spans": [span.to_dict(self.start) for span in sorted(self.spans, key=lambda s: s.start)]
+        }
+
+# trace_id -> (trace summary, marshalled pstats data), oldest first
+_profiles: "OrderedDict[str, tuple]" = OrderedDict()
+_profiles_lock = threading.Lock()
+# Held while a sampled call runs under cProfile
+_profiler_lock = threading.Lock()
+
+def start_trace(name: str) -> Optional[Trace]:
+    """
+    Start a trace for the current context, or return None when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(name, sampled=random.random() < PROFILE_SAMPLE_RATE)
+    _current_trace.set(trace)
+    return trace
+
+def end_trace(trace: Trace):
+    """
+    Finish a trace and keep its profile if the request was slow enough.
+    """
+    trace.finish()
+    _current_trace.set(None)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Trace %s %s took %.1f ms: %s", trace.trace_id, trace.name,
+                     trace.duration_ms, trace.server_timing())
+    if trace.profiles and trace.duration_ms >= PROFILE_THRESHOLD_MS:
+        _store_profile(trace)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a pipeline stage. Yields an object whose set() adds attributes.
+
+    Nested stage names use dots (e.g. "ocr.attempt") and are left out of the
+    Server-Timing header.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield NULL_SPAN
+        return
+    current = Span(name, attributes)
+    try:
+        yield current
+    finally:
+        current.duration_ms = (time.perf_counter() - current.start) * 1000
+        trace.add_span(current)
+
+def bind(fn: Callable, *args) -> Callable[[], Any]:
+    """
+    Wrap a call for run_in_executor so it keeps the current trace and, for
+    sampled traces, runs under cProfile in the worker thread.
+    """
+    ctx = contextvars.copy_context()
+    trace = ctx.get(_current_trace)
+    if trace is None:
+        return lambda: fn(*args)
+    if not trace.sampled:
+        return lambda: ctx.run(fn, *args)
+
+    def run_profiled():
+        # Python 3.12+ allows one active profiler per process; a busy profiler
+        # means this call runs unprofiled, never that it fails
+        if not _profiler_lock.acquire(blocking=False):
+            return ctx.run(fn, *args)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                logger.debug("Skipping profile, profiler unavailable: %s", e)
+                return ctx.run(fn, *args)
+            try:
+                return ctx.run(fn, *args)
+            finally:
+                profile.disable()
+                trace.add_profile(profile)
+        finally:
+            _profiler_lock.release()
+
+    return run_profiled
+
+def _store_profile(trace: Trace):
+    stats = pstats.Stats(trace.profiles[0], stream=io.StringIO())
+    for profile in trace.profiles[1:]:
+        stats.add(profile)
+    # Same format as pstats.Stats.dump_stats, loadable with pstats/snakeviz
+    data = marshal.dumps(stats.stats)
+    with _profiles_lock:
+        _profiles[trace.trace_id] = (trace.to_dict(), data)
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+    logger.info("Captured profile for slow request %s (%.1f ms)", trace.trace_id, trace.duration_ms)
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Summaries of the captured slow-request profiles, newest first.
+    """
+    with _profiles_lock:
+        return [summary for summary, _ in reversed(_profiles.values())]
+
+def get_profile(trace_id: str) -> Optional[bytes]:
+    """
+    Marshalled pstats data for a captured profile, or None if unknown or evicted.
+    """
+    with _profiles_lock:
+        entry = _profiles.get(trace_id)
+    return entry[1] if entry else None
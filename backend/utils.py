@@ -1,30 +1,74 @@
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageDraw
 import pdf2image
 import os
+import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
+from classifier import KeywordClassifier, KeywordConfig
+from layout import PageLayout, DocumentLayout
+import tracing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_ocr_on_image(image: Image.Image, source_info: str = "") -> str:
+# PDF pages are rendered at this DPI for OCR, and only the first pages are processed
+PDF_DPI = 300
+PDF_MAX_PAGES = 5
+
+# Run orientation detection before OCR and rotate pages upright
+OCR_DETECT_ROTATION = os.getenv("OCR_DETECT_ROTATION", "").lower() in ("1", "true", "yes")
+
+class OCRInputError(Exception):
     """
-    Process OCR on a PIL Image with multiple fallback methods.
+    The file itself cannot be OCR'd (missing, unsupported or without text),
+    so running it again would fail the same way.
+    """
+
+def detect_rotation(image: Image.Image) -> Optional[int]:
+    """
+    Detect page rotation with Tesseract's orientation and script detection.
+    
+    Returns:
+        Clockwise rotation in degrees needed to make the page upright, or
+        None if detection failed
+    """
+    try:
+        with tracing.span("ocr.osd"):
+            osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        return int(osd.get("rotate", 0))
+    except Exception as e:
+        logger.warning("Orientation detection failed: %s", e)
+        return None
+
+def process_layout_on_image(image: Image.Image, source_info: str = "", page_number: int = 1) -> PageLayout:
+    """
+    Run OCR on a PIL Image and return the page layout (words, boxes,
+    confidences, block/paragraph/line ids) from a single Tesseract pass,
+    falling back to other page segmentation modes if nothing is found.
     
     Args:
         image: PIL Image object
         source_info: Information about the source (for logging)
+        page_number: Page number recorded in the layout
         
     Returns:
-        Extracted text as string
+        PageLayout; empty if all OCR methods failed
     """
     # Convert to RGB if necessary
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
+    # Orientation detection is an extra (OSD-only) Tesseract pass, so it is opt-in
+    rotation = None
+    if OCR_DETECT_ROTATION:
+        rotation = detect_rotation(image)
+        if rotation:
+            # PIL rotates counter-clockwise
+            image = image.rotate(-rotation, expand=True)
+    
     # Try multiple OCR configurations
     configs = [
         ('--oem 3 --psm 3', 'PSM 3 (automatic page segmentation)'),
@@ -35,173 +79,187 @@ def process_ocr_on_image(image: Image.Image, source_info: str = "") -> str:
     
     for config, description in configs:
         try:
-            if config:
-                text = pytesseract.image_to_string(image, config=config)
-            else:
-                text = pytesseract.image_to_string(image)
+            with tracing.span("ocr.attempt", config=config or "default", source=source_info) as attempt:
+                data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+                layout = PageLayout.from_tesseract(data, page_number, image.size, rotation)
+                attempt.set(words=len(layout))
             
-            logger.info(f"OCR attempt with {description} {source_info}: '{repr(text[:100])}' (length: {len(text)})")
+            # Lazy %-formatting: the preview is only built when DEBUG is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("OCR attempt with %s %s: %r (words: %d)", description, source_info,
+                             layout.text[:100], len(layout))
             
             # If we got meaningful text, return it
-            if text.strip() and len(text.strip()) > 2:
-                logger.info(f"Successfully extracted text with {description}")
-                return text.strip()
+            if len(layout.text.strip()) > 2:
+                logger.info("Successfully extracted text with %s", description)
+                return layout
                 
         except Exception as e:
-            logger.warning(f"OCR attempt with {description} failed: {str(e)}")
+            logger.warning("OCR attempt with %s failed: %s", description, e)
             continue
     
-    # If all methods failed, return empty string
-    logger.warning(f"All OCR methods failed for {source_info}")
-    return ""
+    # If all methods failed, return an empty layout
+    logger.warning("All OCR methods failed for %s", source_info)
+    return PageLayout(page_number, image.size, rotation, [], {})
 
-def process_ocr(file_path: str) -> str:
+def process_ocr_on_image(image: Image.Image, source_info: str = "") -> str:
     """
-    Extract text from PDF or image file using Tesseract OCR.
+    Process OCR on a PIL Image with multiple fallback methods.
     
     Args:
-        file_path: Path to the file to process
+        image: PIL Image object
+        source_info: Information about the source (for logging)
         
     Returns:
         Extracted text as string
+    """
+    return process_layout_on_image(image, source_info).text.strip()
+
+def process_ocr_layout(file_path: str) -> DocumentLayout:
+    """
+    Extract the page layout from a PDF or image file using Tesseract OCR.
+    
+    Args:
+        file_path: Path to the file to process
+        
+    Returns:
+        DocumentLayout with one PageLayout per OCR'd page; its text property
+        gives the extracted text
         
     Raises:
+        OCRInputError: If the file is missing, unsupported or has no text
         Exception: If OCR processing fails
     """
     if not os.path.exists(file_path):
-        raise Exception(f"File not found: {file_path}")
+        raise OCRInputError(f"File not found: {file_path}")
     
-    text = ""
     file_path_lower = file_path.lower()
     
     try:
         if file_path_lower.endswith(".pdf"):
-            logger.info(f"Processing PDF file: {file_path}")
+            logger.info("Processing PDF file: %s", file_path)
             # Convert PDF pages to images and extract text
             try:
-                pages = pdf2image.convert_from_path(
-                    file_path,
-                    dpi=300,  # Higher DPI for better OCR accuracy
-                    first_page=1,
-                    last_page=5  # Limit to first 5 pages for performance
-                )
+                with tracing.span("ocr.pdf_convert") as convert:
+                    pages = pdf2image.convert_from_path(
+                        file_path,
+                        dpi=PDF_DPI,  # Higher DPI for better OCR accuracy
+                        first_page=1,
+                        last_page=PDF_MAX_PAGES  # Limit to first pages for performance
+                    )
+                    convert.set(pages=len(pages))
                 
                 if not pages:
-                    raise Exception("No pages found in PDF")
+                    raise OCRInputError("No pages found in PDF")
                 
-                logger.info(f"Successfully converted PDF to {len(pages)} page(s)")
+                logger.info("Successfully converted PDF to %d page(s)", len(pages))
                 
+                page_layouts = []
                 for i, page in enumerate(pages):
-                    logger.info(f"Processing page {i+1}/{len(pages)}")
+                    logger.info("Processing page %d/%d", i + 1, len(pages))
                     
-                    # Use the improved OCR processing
-                    page_text = process_ocr_on_image(page, f"from PDF page {i+1}")
+                    with tracing.span("ocr.page", page=i + 1):
+                        page_layout = process_layout_on_image(page, f"from PDF page {i+1}", page_number=i + 1)
                     
-                    if page_text:
-                        text += f"\n--- Page {i+1} ---\n{page_text}"
-                    else:
-                        logger.warning(f"No text extracted from page {i+1}")
+                    if not page_layout.text:
+                        logger.warning("No text extracted from page %d", i + 1)
+                    page_layouts.append(page_layout)
+                
+                layout = DocumentLayout(page_layouts, paged=True)
                     
+            except OCRInputError:
+                raise
             except Exception as e:
                 raise Exception(f"PDF processing failed: {str(e)}")
                 
         elif file_path_lower.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff')):
-            logger.info(f"Processing image file: {file_path}")
+            logger.info("Processing image file: %s", file_path)
             try:
                 # Open and process image
                 image = Image.open(file_path)
-                logger.info(f"Image loaded: mode={image.mode}, size={image.size}")
+                logger.info("Image loaded: mode=%s, size=%s", image.mode, image.size)
                 
-                # Use the improved OCR processing
-                text = process_ocr_on_image(image, f"from image file")
+                layout = DocumentLayout([process_layout_on_image(image, "from image file")])
                 
             except Exception as e:
                 raise Exception(f"Image processing failed: {str(e)}")
         else:
-            raise Exception(f"Unsupported file format: {file_path}")
+            raise OCRInputError(f"Unsupported file format: {file_path}")
         
-        # Clean up extracted text
-        text = text.strip()
+        text = layout.text
         if not text or len(text) < 3:
-            raise Exception("No meaningful text could be extracted from the document")
+            raise OCRInputError("No meaningful text could be extracted from the document")
             
-        logger.info(f"Successfully extracted {len(text)} characters of text")
-        return text
+        logger.info("Successfully extracted %d characters of text", len(text))
+        return layout
         
     except Exception as e:
-        logger.error(f"OCR processing failed for {file_path}: {str(e)}")
+        logger.error("OCR processing failed for %s: %s", file_path, e)
         raise
 
-def classify_document(text: str, config: Dict[str, list]) -> Dict[str, Any]:
+def process_ocr(file_path: str) -> str:
     """
-    Classify document type based on keyword matching.
+    Extract text from PDF or image file using Tesseract OCR.
     
     Args:
-        text: Extracted text from OCR
-        config: Dictionary mapping document types to keyword lists
+        file_path: Path to the file to process
         
     Returns:
-        Dictionary containing document_type and keyword_counts
-    """
-    if not text or not text.strip():
-        return {
-            "document_type": "Unknown",
-            "keyword_counts": {},
-            "confidence": 0.0
-        }
-    
-    text_lower = text.lower()
-    keyword_counts = {}
-    total_keywords = 0
-    
-    # Count keyword occurrences for each document type
-    for doc_type, keywords in config.items():
-        count = 0
-        matched_keywords = []
-        
-        for keyword in keywords:
-            keyword_lower = keyword.lower()
-            keyword_count = text_lower.count(keyword_lower)
-            count += keyword_count
-            total_keywords += len(keywords)
-            
-            if keyword_count > 0:
-                matched_keywords.append(keyword)
-        
-        keyword_counts[doc_type] = {
-            "count": count,
-            "matched_keywords": matched_keywords,
-            "total_possible": len(keywords)
-        }
-    
-    # Determine document type with highest keyword count
-    if not keyword_counts:
-        document_type = "Unknown"
-        confidence = 0.0
-    else:
-        # Find the document type with the highest count
-        best_match = max(keyword_counts.items(), key=lambda x: x[1]["count"])
-        document_type = best_match[0]
-        best_count = best_match[1]["count"]
-        
-        # Calculate confidence based on keyword matches
-        if total_keywords > 0:
-            confidence = min(best_count / max(1, len(config[document_type])), 1.0)
-        else:
-            confidence = 0.0
+        Extracted text as string
         
-        # If no keywords found, classify as Unknown
-        if best_count == 0:
-            document_type = "Unknown"
+    Raises:
+        Exception: If OCR processing fails
+    """
+    return process_ocr_layout(file_path).text
+
+# Used when config.json is missing
+DEFAULT_CLASSIFICATION_CONFIG = {
+    "Invoice": ["Invoice Number", "Total", "Date", "Due", "Bill", "Amount"],
+    "Bank Statement": ["Account Number", "Transaction", "Balance", "Statement", "Bank", "Deposit"],
+    "Contract": ["Parties", "Agreement", "Effective Date", "Terms", "Contract", "Party"]
+}
+
+def load_classification_config(config_path: Path) -> KeywordConfig:
+    """
+    Load the document classification config, falling back to the defaults
+    if the file does not exist.
+    """
+    try:
+        with open(config_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return DEFAULT_CLASSIFICATION_CONFIG
+
+# Compiled classifiers, keyed by the identity of the config they were built from
+_classifier_cache: Dict[int, Tuple[Dict[str, Any], KeywordClassifier]] = {}
+
+def get_classifier(config: KeywordConfig) -> KeywordClassifier:
+    """
+    Return the compiled classifier for a config, building it on first use.
     
-    logger.info(f"Document classified as: {document_type} (confidence: {confidence:.2f})")
+    The config is compiled once and reused; build a new config dict rather
+    than mutating one in place if the keywords change at runtime.
+    """
+    cached = _classifier_cache.get(id(config))
+    if cached is None or cached[0] is not config:
+        cached = (config, KeywordClassifier(config))
+        _classifier_cache[id(config)] = cached
+    return cached[1]
+
+def classify_document(text: str, config: KeywordConfig) -> Dict[str, Any]:
+    """
+    Classify document type based on weighted keyword matching.
     
-    return {
-        "document_type": document_type,
-        "keyword_counts": {k: v["count"] for k, v in keyword_counts.items()},
-        "detailed_matches": keyword_counts,
-        "confidence": confidence
-    }
+    Args:
+        text: Extracted text from OCR
+        config: Dictionary mapping document types to keyword lists or
+            {keyword: weight} mappings
+        
+    Returns:
+        Dictionary containing document_type, keyword_counts, detailed_matches
+        and confidence
+    """
+    return get_classifier(config).classify(text)
 
 def validate_tesseract_installation():
     """
@@ -235,9 +293,45 @@ def validate_pdf2image_installation():
         logger.error(f"pdf2image not found: {str(e)}")
         return False
 
-# Validate installations on module import
-if not validate_tesseract_installation():
-    logger.warning("Tesseract OCR is not properly installed. OCR functionality may not work.")
+def warm_up_ocr() -> bool:
+    """
+    Run a tiny OCR job so the Tesseract binary and language data are loaded
+    before the first real request arrives.
+    
+    Returns:
+        bool: True if the warm-up job completed, False otherwise
+    """
+    try:
+        image = Image.new('RGB', (200, 60), 'white')
+        ImageDraw.Draw(image).text((10, 20), "warm up", fill='black')
+        pytesseract.image_to_string(image, config='--oem 3 --psm 7')
+        return True
+    except Exception as e:
+        logger.error(f"OCR warm-up failed: {str(e)}")
+        return False
 
-if not validate_pdf2image_installation():
-    logger.warning("pdf2image is not properly installed. PDF processing may not work.")
+def initialize_ocr_engine() -> Dict[str, bool]:
+    """
+    Validate OCR dependencies and pre-warm the engine.
+    
+    This used to run on module import; it is now called explicitly during
+    application startup so importing utils has no side effects.
+    
+    Returns:
+        Dictionary with tesseract, pdf2image and warm flags
+    """
+    status = {
+        "tesseract": validate_tesseract_installation(),
+        "pdf2image": validate_pdf2image_installation(),
+        "warm": False
+    }
+    
+    if not status["tesseract"]:
+        logger.warning("Tesseract OCR is not properly installed. OCR functionality may not work.")
+    else:
+        status["warm"] = warm_up_ocr()
+    
+    if not status["pdf2image"]:
+        logger.warning("pdf2image is not properly installed. PDF processing may not work.")
+    
+    return status
@@ -0,0 +1,141 @@
+"""
+OCR worker process for the queue backend.
+
+Leases OCR jobs from the durable job queue, runs them and records the result.
+Start as many workers as the host can handle, all pointing at the same queue
+file as the API (OCR_QUEUE_PATH):
+
+    python worker.py --queue ./data/queue.db
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import utils
+from job_queue import JobQueue, Job
+
+logger = logging.getLogger(__name__)
+
+# How often a worker reports it is alive; well inside JobQueue.live_workers' max_age
+LIVENESS_INTERVAL = 5.0
+
+class Heartbeat:
+    """
+    Keep extending a job's lease, and keep the worker's liveness fresh, from a
+    background thread while the job runs.
+    """
+
+    def __init__(self, queue: JobQueue, job: Job, lease_seconds: float,
+                 on_beat: Optional[Callable[[], None]] = None):
+        self.queue = queue
+        self.job = job
+        self.lease_seconds = lease_seconds
+        self.on_beat = on_beat
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(min(self.lease_seconds / 3, LIVENESS_INTERVAL)):
+            if not self.queue.heartbeat(self.job, self.lease_seconds):
+                self.lost = True
+                logger.warning("Lost lease on job %d", self.job.id)
+                return
+            if self.on_beat is not None:
+                self.on_beat()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+class Worker:
+    """
+    Lease, process and acknowledge OCR jobs until stopped.
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: str, lease_seconds: float = 60.0,
+                 poll_interval: float = 0.5):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.warm = False
+        self.stopping = False
+        self._last_seen = 0.0
+
+    def stop(self, *args):
+        logger.info("Worker %s stopping after the current job", self.worker_id)
+        self.stopping = True
+
+    def register(self, force: bool = False):
+        # Throttled liveness update used by the API's /ready check
+        now = time.monotonic()
+        if force or now - self._last_seen >= LIVENESS_INTERVAL:
+            self.queue.register_worker(self.worker_id, self.warm)
+            self._last_seen = now
+
+    def process(self, job: Job):
+        file_path = job.payload["file_path"]
+        logger.info("Job %d attempt %d/%d: %s", job.id, job.attempts, job.max_attempts, file_path)
+        with Heartbeat(self.queue, job, self.lease_seconds, on_beat=self.register) as heartbeat:
+            try:
+                layout = utils.process_ocr_layout(file_path)
+            except utils.OCRInputError as e:
+                # The same file would fail the same way, don't retry it
+                if not heartbeat.lost:
+                    self.queue.fail(job, str(e), retry=False)
+                return
+            except Exception as e:
+                if not heartbeat.lost:
+                    self.queue.fail(job, f"OCR processing failed: {str(e)}")
+                return
+        if heartbeat.lost or not self.queue.complete(job, {"layout": layout.to_dict()}):
+            logger.warning("Discarding result for job %d, lease was lost", job.id)
+
+    def run(self):
+        self.warm = utils.initialize_ocr_engine()["warm"]
+        self.register(force=True)
+        logger.info("Worker %s ready (warm=%s)", self.worker_id, self.warm)
+        try:
+            while not self.stopping:
+                self.register()
+                job = self.queue.lease(self.worker_id, self.lease_seconds)
+                if job is None:
+                    time.sleep(self.poll_interval)
+                    continue
+                self.process(job)
+        finally:
+            self.queue.unregister_worker(self.worker_id)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process OCR jobs from the durable job queue.")
+    parser.add_argument("--queue", default=os.getenv("OCR_QUEUE_PATH"),
+                        help="Queue database file (defaults to OCR_QUEUE_PATH)")
+    parser.add_argument("--lease-seconds", type=float, default=60.0,
+                        help="Lease length; the lease is renewed every third of this while a job runs")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    args = parser.parse_args(argv)
+
+    if not args.queue:
+        parser.error("provide --queue or set OCR_QUEUE_PATH")
+
+    worker = Worker(JobQueue(args.queue), args.worker_id, args.lease_seconds, args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())